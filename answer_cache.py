@@ -0,0 +1,149 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """LLM answers reused for near-identical questions asked against the same retrieved chunks.
+
+    A lookup hits when an earlier question has cosine similarity >= `threshold` to the new one (using
+    `embed`, normally DocumentManager.embed_query) and was answered from the same retrieved chunks,
+    identified by file and content hash rather than by id: stores reuse freed ids, so an id says nothing
+    about the text behind it. Edited documents yield different hashes, so their stale answers simply stop
+    matching and age out. Entries expire after `ttl` seconds, the least recently used beyond `max_entries`
+    are evicted, and with `path` they are also kept in a SQLite file so they survive restarts.
+    """
+    def __init__(self, embed, threshold: float = 0.93, ttl: float = 24 * 3600, max_entries: int = 2048,
+                 path: str = None, namespace: str = ""):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        # Separates answers from different embedding models, vector stores and LLM endpoints
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0  # LLM time avoided, from the latency recorded with each answer
+        self._entries = OrderedDict()  # entry id -> {"fingerprint", "vector", "answer", "created", "latency"}
+        self._by_fingerprint = {}
+        self._lock = threading.Lock()
+
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, vector BLOB NOT NULL, question TEXT, "
+                "answer TEXT NOT NULL, created REAL NOT NULL, latency REAL)"
+            )
+            with self.db:
+                self.db.execute("DELETE FROM answers WHERE created < ?", (time.time() - ttl,))
+            rows = self.db.execute(
+                "SELECT id, fingerprint, vector, answer, created, latency FROM answers ORDER BY created DESC LIMIT ?",
+                (max_entries,)
+            ).fetchall()
+            for entry_id, fingerprint, vector, answer, created, latency in reversed(rows):
+                self._add(entry_id, fingerprint, np.frombuffer(vector, dtype=np.float32), answer, created, latency)
+
+    @staticmethod
+    def _source_key(source) -> str:
+        """File and content hash of a retrieved chunk; the id only for chunks stored without a hash."""
+        metadata = source.get("metadata") or {}
+        if metadata.get("chunk_hash"):
+            return f"{metadata.get('file', '')}|{metadata['chunk_hash']}"
+        return f"id|{source['id']}"
+
+    def fingerprint(self, sources) -> str:
+        """Identifies the retrieved context: the namespace plus the set of chunks (query results)."""
+        keys = sorted(self._source_key(source) for source in sources)
+        return hashlib.blake2b(json.dumps([self.namespace, keys]).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _vector(self, question):
+        vector = np.asarray(self.embed(question), dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, question: str, sources):
+        """The cached answer for a close enough question over the same chunks, or None."""
+        fingerprint, vector = self.fingerprint(sources), self._vector(question)
+        now = time.time()
+        with self._lock:
+            best, best_similarity = None, self.threshold
+            for entry_id in list(self._by_fingerprint.get(fingerprint, ())):
+                entry = self._entries[entry_id]
+                if now - entry["created"] > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(entry["vector"] @ vector)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry_id, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self.hits += 1
+            self.saved_seconds += self._entries[best]["latency"] or 0.0
+            return self._entries[best]["answer"]
+
+    def put(self, question: str, sources, answer: str, latency: float = None):
+        """Remember an answer; `latency` (seconds the LLM took) feeds the saved-time metric."""
+        if not answer:
+            return
+        fingerprint, vector = self.fingerprint(sources), self._vector(question)
+        entry_id, created = uuid.uuid4().hex, time.time()
+        with self._lock:
+            self._add(entry_id, fingerprint, vector, answer, created, latency)
+            if self.db is not None:
+                with self.db:
+                    self.db.execute(
+                        "INSERT INTO answers (id, fingerprint, vector, question, answer, created, latency) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (entry_id, fingerprint, vector.astype(np.float32).tobytes(), question, answer, created, latency)
+                    )
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _add(self, entry_id, fingerprint, vector, answer, created, latency):
+        self._entries[entry_id] = {
+            "fingerprint": fingerprint, "vector": vector, "answer": answer, "created": created, "latency": latency
+        }
+        self._by_fingerprint.setdefault(fingerprint, set()).add(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_fingerprint[entry["fingerprint"]]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_fingerprint[entry["fingerprint"]]
+        if self.db is not None:
+            with self.db:
+                self.db.execute("DELETE FROM answers WHERE id = ?", (entry_id,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+            if self.db is not None:
+                with self.db:
+                    self.db.execute("DELETE FROM answers")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "maxsize": self.max_entries,
+            "saved_seconds": self.saved_seconds,
+        }
@@ -1,40 +1,116 @@
+import os
 import streamlit as st
 st.set_page_config(page_title="RAG Chatbot", layout="wide")
 
 from document_manager import DocumentManager
+from embedding_model import EmbeddingModel
 from chat.interface import LLMInterface
+from rag_prompt import pack_context, load_prompt_tokenizer
+from answer_cache import SemanticAnswerCache
+from llm_api import API_URL
+import metrics
+
+DB_TYPES = ["pinecone", "faiss", "chroma"]
+MODEL_NAMES = ["all-MiniLM-L6-v2", "all-mpnet-base-v2", "distilbert-base-nli-stsb-mean-tokens"]
+# Configuration preloaded when the server handles its first session
+DEFAULT_DB = os.getenv("RAG_DEFAULT_DB", DB_TYPES[0])
+DEFAULT_MODEL = os.getenv("RAG_DEFAULT_MODEL", MODEL_NAMES[0])
+
+
+# Streamlit reruns this script on every interaction; models and vector-store handles live in
+# process-wide caches shared by all reruns and sessions, with the least recently used evicted.
+@st.cache_resource(max_entries=2, show_spinner="Loading embedding model...")
+def get_embedding_model(model_name: str) -> EmbeddingModel:
+    return EmbeddingModel(model_name)
+
+
+@st.cache_resource(max_entries=4, show_spinner="Opening vector store...")
+def get_doc_manager(db_type: str, model_name: str) -> DocumentManager:
+    # The app only queries, so FAISS is opened read-only and memory-mapped; the cached handle remaps the
+    # index whenever the CLI or folder watcher saves a new one, so their files become searchable here
+    db_options = {"read_only": True} if db_type == "faiss" else None
+    doc_manager = DocumentManager(db_type=db_type, model_name=model_name, db_options=db_options,
+                                  embedding_model=get_embedding_model(model_name))
+    doc_manager.warm_up()
+    return doc_manager
+
+
+@st.cache_resource(max_entries=4)
+def get_answer_cache(db_type: str, model_name: str) -> SemanticAnswerCache:
+    # Shared by all sessions, so one user's answer serves everyone asking the same thing
+    return SemanticAnswerCache(get_doc_manager(db_type, model_name).embed_query,
+                               path=os.getenv("RAG_ANSWER_CACHE", "answer_cache.sqlite") or None,
+                               namespace=f"{db_type}|{model_name}|{API_URL}")
+
+
+@st.cache_resource
+def start_metrics_server(port: int):
+    # One Prometheus endpoint per server process, however many sessions rerun this script
+    return metrics.serve(port)
+
+
+# Stage timings feed the per-question latency breakdown; RAG_METRICS=0 turns them off
+metrics.enable(os.getenv("RAG_METRICS", "1").lower() not in ("0", "false", "no", "off"))
+if os.getenv("RAG_METRICS_PORT"):
+    start_metrics_server(int(os.getenv("RAG_METRICS_PORT")))
+
+# Warm start: the default configuration is loaded once per server process, before any UI is drawn
+get_doc_manager(DEFAULT_DB, DEFAULT_MODEL)
 
 # Sidebar selection for DB and Model
 st.sidebar.title("⚙️ Configuration")
-db_type = st.sidebar.selectbox("Select Vector DB", ["pinecone", "faiss", "chroma"])
-model_name = st.sidebar.selectbox("Select Embedding Model", [
-    "all-MiniLM-L6-v2", "all-mpnet-base-v2", "distilbert-base-nli-stsb-mean-tokens"
-])
+db_type = st.sidebar.selectbox("Select Vector DB", DB_TYPES, index=DB_TYPES.index(DEFAULT_DB))
+model_name = st.sidebar.selectbox("Select Embedding Model", MODEL_NAMES, index=MODEL_NAMES.index(DEFAULT_MODEL))
+hybrid = st.sidebar.checkbox("Hybrid search (keywords + vectors)", value=True,
+                             help="Also match exact identifiers, error codes and names via a BM25 keyword index")
 
-# Initialize backend components
-llm = LLMInterface()
-doc_manager = DocumentManager(db_type=db_type, model_name=model_name)
+# Initialize backend components; the LLM keeps per-user history, so it lives in the session
+if "llm" not in st.session_state:
+    st.session_state.llm = LLMInterface()
+llm = st.session_state.llm
+doc_manager = get_doc_manager(db_type, model_name)
+llm.answer_cache = get_answer_cache(db_type, model_name)
 
 # Main UI
 st.title("🧠 RAG-powered QA Chatbot")
 user_query = st.text_input("Ask a question about your documents:")
 submit_button = st.button("Submit")
 
+
+def show_latency_breakdown(request_trace):
+    total = request_trace.to_dict()["total_ms"]
+    with st.expander(f"⏱️ Latency breakdown ({total:.0f} ms)"):
+        st.table([
+            {"stage": "\u2003" * span["depth"] + span["stage"], "ms": round(span["ms"], 1),
+             "share": f"{span['ms'] / total:.0%}" if total else ""}
+            for span in request_trace.breakdown()
+        ])
+
+
 if submit_button and user_query:
-    with st.spinner("Retrieving relevant context..."):
-        relevant_docs = doc_manager.query(user_query)
-        if not relevant_docs:
-            st.warning("No relevant documents found.")
-        else:
-            context = "\n\n".join([
-                f"[{i+1}] {doc.get('metadata', {}).get('chunk_text', '')}"
-                for i, doc in enumerate(relevant_docs)
-            ])
-
-            with st.expander("🔍 Retrieved Context"):
-                st.write(context)
-
-            with st.spinner("Generating response..."):
-                answer = llm.ask(user_query, context=context)
+    with metrics.trace("question") as request_trace:
+        with st.spinner("Retrieving relevant context..."):
+            # The manager is shared by all sessions; concurrent questions are embedded and searched together
+            with metrics.span("retrieve"):
+                if hybrid:
+                    relevant_docs = doc_manager.hybrid_query(user_query, batched=True)
+                else:
+                    relevant_docs = doc_manager.batcher.query(user_query)
+            if not relevant_docs:
+                st.warning("No relevant documents found.")
+            else:
+                # Merge neighbouring chunks and fill the LLM's context budget, counted in its own tokens
+                tokenizer = load_prompt_tokenizer() or doc_manager.chunker.tokenizer
+                context = pack_context(relevant_docs, tokenizer)
+
+                with st.expander("🔍 Retrieved Context"):
+                    st.write(context)
+
+                # Render the answer token by token as it streams in
                 st.success("💬 Answer:")
-                st.write(answer)
+                st.write_stream(llm.ask_stream(user_query, context=context, sources=relevant_docs))
+                if llm.last_cached:
+                    stats = llm.answer_cache.stats()
+                    st.caption(f"⚡ Answered from cache ({stats['hits']} hits, {stats['hit_rate']:.0%} hit rate)")
+    if metrics.ENABLED:
+        show_latency_breakdown(request_trace)
@@ -0,0 +1 @@
+"""Offline benchmark suite; run `python -m bench --help`."""
@@ -0,0 +1,185 @@
+"""Offline benchmark: ingest throughput, query latency, peak memory and index size per DB, model and size.
+
+    python -m bench --db faiss chroma --models all-MiniLM-L6-v2 --sizes 100 1000 --output results.json
+    python -m bench --baseline results-v1.json   # exit status 1 if a metric regressed
+
+Pinecone is benchmarked against an in-memory stand-in (bench/local_pinecone.py); --pinecone-latency-ms
+adds a simulated round-trip per request.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+from bench.corpus import build_corpus
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_TYPES = ["faiss", "chroma", "pinecone"]
+MODEL_NAMES = [
+    "all-MiniLM-L6-v2", "all-mpnet-base-v2", "distilbert-base-nli-stsb-mean-tokens",
+    "bert-base-nli-mean-tokens", "roberta-base-nli-mean-tokens"
+]
+# Compared against --baseline: (path in a case result, True if higher is better)
+METRICS = [
+    ("ingest.load.files_per_s", True),
+    ("ingest.chunk.chunks_per_s", True),
+    ("ingest.embed.chunks_per_s", True),
+    ("ingest.write.chunks_per_s", True),
+    ("query.vector.p50_ms", False),
+    ("query.vector.p95_ms", False),
+    ("query.vector.p99_ms", False),
+    ("query.search.p95_ms", False),
+    ("query.hybrid.p95_ms", False),
+    ("peak_rss_mb", False),
+    ("index_bytes", False),
+]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Offline RAG benchmark")
+    parser.add_argument("--db", nargs="+", choices=DB_TYPES, default=DB_TYPES)
+    parser.add_argument("--models", nargs="+", default=MODEL_NAMES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000], help="Corpus sizes (documents)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per case")
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--corpus-dir", default="bench_corpus", help="Where the synthetic corpus is generated")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--pinecone-latency-ms", type=float, default=0.0,
+                        help="Simulated network round-trip per Pinecone request")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    parser.add_argument("--keep", action="store_true", help="Keep each case's working directory")
+    return parser.parse_args()
+
+
+def _environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    packages = {}
+    for name in ["numpy", "faiss-cpu", "chromadb", "pinecone", "sentence-transformers", "torch", "PyMuPDF"]:
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def run_in_subprocess(case: dict, keep: bool = False) -> dict:
+    """Run one case in a fresh interpreter and empty working directory."""
+    base = tempfile.mkdtemp(prefix="rag-bench-")
+    work_dir = os.path.join(base, "work")
+    os.makedirs(work_dir)
+    case_path, result_path, log_path = (os.path.join(base, name) for name in ("case.json", "result.json", "log.txt"))
+    with open(case_path, "w") as f:
+        json.dump(case, f)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+    try:
+        with open(log_path, "w") as log:
+            process = subprocess.run([sys.executable, "-m", "bench.run", case_path, result_path],
+                                     cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if process.returncode != 0:
+            with open(log_path, errors="replace") as f:
+                tail = f.read()[-2000:]
+            return {"db": case["db"], "model": case["model"], "docs": case["num_docs"],
+                    "error": f"exit status {process.returncode}", "log": tail}
+        with open(result_path) as f:
+            return json.load(f)
+    finally:
+        if keep:
+            print(f"📁 Kept {base}")
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def _get(result: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """Metrics that got worse than the baseline by more than `threshold` (relative)."""
+    previous = {(r["db"], r["model"], r["docs"]): r for r in baseline if "error" not in r}
+    regressions = []
+    for result in results:
+        before = previous.get((result["db"], result["model"], result["docs"]))
+        if before is None or "error" in result:
+            continue
+        for path, higher_is_better in METRICS:
+            old, new = _get(before, path), _get(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{result['db']}/{result['model']}/{result['docs']} {path}: "
+                                   f"{old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def _summary(result: dict) -> str:
+    if "error" in result:
+        return f"❌ {result['db']:8} {result['model']:36} {result['docs']:>6} docs  {result['error']}"
+    ingest, query = result["ingest"], result["query"]
+    return (f"✅ {result['db']:8} {result['model']:36} {result['docs']:>6} docs  "
+            f"embed {ingest['embed']['chunks_per_s'] or 0:7.1f} chunks/s  write {ingest['write']['chunks_per_s'] or 0:8.1f} chunks/s  "
+            f"query p50/p95/p99 {query['vector']['p50_ms']:.1f}/{query['vector']['p95_ms']:.1f}/"
+            f"{query['vector']['p99_ms']:.1f} ms  RSS {result['peak_rss_mb']:.0f} MB  "
+            f"index {result['index_bytes'] / 1e6:.1f} MB")
+
+
+def main():
+    args = parse_arguments()
+    corpus_dir = os.path.abspath(args.corpus_dir)
+    print(f"📝 Generating corpus of {max(args.sizes)} documents in {corpus_dir}")
+    build_corpus(corpus_dir, max(args.sizes))
+
+    results = []
+    for model in args.models:
+        for db in args.db:
+            for size in sorted(args.sizes):
+                case = {"db": db, "model": model, "corpus_dir": corpus_dir, "num_docs": size,
+                        "num_queries": args.queries, "top_k": args.top_k,
+                        "pinecone_latency": args.pinecone_latency_ms / 1000}
+                print(f"⏱️ {db} / {model} / {size} docs ...")
+                result = run_in_subprocess(case, keep=args.keep)
+                print(_summary(result))
+                results.append(result)
+
+    report = {"environment": _environment(), "settings": vars(args), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        if regressions:
+            print(f"⚠️ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} vs {args.baseline}")
+    if any("error" in result for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
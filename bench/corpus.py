@@ -0,0 +1,130 @@
+import csv
+import os
+import random
+
+# Every document is generated from its own seed, so a corpus of N documents is the first N of any larger one
+SEED = 1234
+DOC_TYPES = [("txt", 0.7), ("pdf", 0.15), ("csv", 0.15)]
+
+_ONSETS = ["b", "c", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "w", "z",
+           "br", "ch", "cl", "dr", "fl", "gr", "pl", "pr", "sh", "st", "th", "tr"]
+_VOWELS = ["a", "e", "i", "o", "u", "ai", "ea", "ou", "io"]
+_CODAS = ["", "", "n", "r", "s", "t", "l", "m", "nd", "st", "ck"]
+
+
+def _vocabulary(size: int = 4000, seed: int = SEED) -> list[str]:
+    rng = random.Random(seed)
+    words, seen = [], set()
+    while len(words) < size:
+        word = "".join(rng.choice(_ONSETS) + rng.choice(_VOWELS) for _ in range(rng.randint(1, 3)))
+        word += rng.choice(_CODAS)
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+VOCABULARY = _vocabulary()
+# Zipf-like word frequencies, as in natural text (matters for BM25 and the chunker's token counts)
+_CUM_WEIGHTS = []
+for _rank in range(len(VOCABULARY)):
+    _CUM_WEIGHTS.append((_CUM_WEIGHTS[-1] if _CUM_WEIGHTS else 0.0) + 1.0 / (_rank + 1))
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(VOCABULARY, cum_weights=_CUM_WEIGHTS, k=rng.randint(8, 22))
+    if rng.random() < 0.15:
+        # Identifiers and codes, the kind of token keyword search is for
+        words.insert(rng.randrange(len(words)), f"ERR-{rng.randint(1000, 9999)}")
+    return " ".join([words[0].capitalize()] + words[1:]) + "."
+
+
+def _paragraph(rng: random.Random) -> str:
+    return " ".join(_sentence(rng) for _ in range(rng.randint(3, 8)))
+
+
+def _text(rng: random.Random, target_chars: int) -> list[str]:
+    paragraphs, size = [], 0
+    while size < target_chars:
+        paragraphs.append(_paragraph(rng))
+        size += len(paragraphs[-1])
+    return paragraphs
+
+
+def _write_txt(path, rng, target_chars):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(_text(rng, target_chars)) + "\n")
+
+
+def _write_pdf(path, rng, target_chars):
+    import fitz  # PyMuPDF, already needed to read PDFs
+
+    doc = fitz.open()
+    page, y = None, 0
+    for paragraph in _text(rng, target_chars):
+        if page is None or y > 700:
+            page, y = doc.new_page(), 72
+        # Ten-point Helvetica fits roughly 95 characters on a line of the box
+        lines = len(paragraph) // 95 + 1
+        rect = fitz.Rect(72, y, 540, min(y + 14 * lines + 14, 800))
+        page.insert_textbox(rect, paragraph, fontsize=10)
+        y = rect.y1 + 10
+    # Fixed dates keep the file bytes identical between runs
+    doc.set_metadata({"creationDate": "D:20240101000000", "modDate": "D:20240101000000", "producer": "bench"})
+    doc.save(path, garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+
+
+def _write_csv(path, rng, target_chars):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sku", "category", "description", "price"])
+        size = 0
+        while size < target_chars:
+            row = [f"SKU-{rng.randint(10000, 99999)}", rng.choice(VOCABULARY[:50]),
+                   _sentence(rng), f"{rng.uniform(1, 500):.2f}"]
+            writer.writerow(row)
+            size += sum(len(value) for value in row)
+
+
+_WRITERS = {"txt": _write_txt, "pdf": _write_pdf, "csv": _write_csv}
+
+
+def document_spec(index: int, seed: int = SEED) -> tuple[str, int]:
+    """File type and approximate size (characters) of document `index`."""
+    rng = random.Random(f"{seed}:spec:{index}")
+    kinds, weights = zip(*DOC_TYPES)
+    return rng.choices(kinds, weights=weights)[0], int(rng.lognormvariate(8.3, 0.6))  # median ~4k chars
+
+
+def build_corpus(directory: str, num_docs: int, seed: int = SEED) -> list[str]:
+    """Write (or reuse) documents 0..num_docs-1 in `directory` and return their paths in order."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(num_docs):
+        kind, chars = document_spec(index, seed)
+        path = os.path.join(directory, f"doc_{index:06d}.{kind}")
+        if not os.path.exists(path):
+            _WRITERS[kind](path, random.Random(f"{seed}:doc:{index}"), chars)
+        paths.append(path)
+    return paths
+
+
+def make_queries(num_queries: int, num_docs: int, seed: int = SEED) -> list[str]:
+    """Queries drawn from the documents' own sentences, so every one has relevant chunks to find."""
+    rng = random.Random(f"{seed}:queries:{num_docs}")
+    queries = []
+    for _ in range(num_queries):
+        index = rng.randrange(num_docs)
+        kind, chars = document_spec(index, seed)
+        # Replaying the document's generator gives its paragraphs without reading the file back
+        doc_rng = random.Random(f"{seed}:doc:{index}")
+        if kind == "csv":
+            doc_rng.randint(10000, 99999)  # the first row's sku and category come before its description
+            doc_rng.choice(VOCABULARY[:50])
+            words = _sentence(doc_rng).rstrip(".").split()
+        else:
+            words = " ".join(_text(doc_rng, min(chars, 600))).split()
+        start = rng.randrange(max(1, len(words) - 8))
+        queries.append(" ".join(words[start:start + rng.randint(4, 8)]).replace(".", ""))
+    return queries
@@ -0,0 +1,100 @@
+"""Import-time budget check: startup paths must stay fast and must not pull in heavy libraries.
+
+    python -m bench.import_time              # exit status 1 if a budget is exceeded
+    python -m bench.import_time --scale 2    # looser budgets on a slow machine
+
+Each check runs in a fresh interpreter. Budgets are wall-clock milliseconds for the whole process,
+including interpreter startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.__main__ import REPO_ROOT
+
+HEAVY_MODULES = ["chromadb", "pinecone", "faiss", "torch", "transformers", "sentence_transformers",
+                 "watchdog", "nltk", "streamlit"]
+
+_LIST_FAISS = ("import runpy, sys; sys.argv = ['main.py', '--db', 'faiss', '--model', 'all-MiniLM-L6-v2', 'list']; "
+               f"runpy.run_path({os.path.join(REPO_ROOT, 'main.py')!r}, run_name='__main__')")
+# Untimed setup for the populated case: a metadata store with indexed documents, as after some ingests
+_POPULATE_FAISS = (
+    "from document_manager import DocumentManager\n"
+    "manager = DocumentManager('faiss', 'all-MiniLM-L6-v2')\n"
+    "for i in range(50):\n"
+    "    manager.metadata.put(f'/docs/file{i}.txt', i * 100, f'hash{i}', [[i * 100 + j, f'chunk{j}'] for j in range(100)])\n"
+)
+
+# (name, code run in the child, budget in ms, modules that must not be imported, untimed setup code or None).
+# Every check runs in its own empty working directory, so `list` finds only what the setup wrote.
+CHECKS = [
+    ("import document_manager", "import document_manager", 600, HEAVY_MODULES, None),
+    ("import main", "import main", 600, HEAVY_MODULES, None),
+    ("main.py list (faiss)", _LIST_FAISS, 800, HEAVY_MODULES, None),
+    ("main.py list (faiss, 50 docs)", _LIST_FAISS, 800, HEAVY_MODULES, _POPULATE_FAISS),
+    ("faiss backend only", "import vector_db; vector_db.get_backend('faiss')", 1500,
+     ["chromadb", "pinecone", "torch", "sentence_transformers"], None),
+    ("pinecone backend only", "import vector_db; vector_db.get_backend('pinecone')", 3000,
+     ["chromadb", "faiss", "torch", "sentence_transformers"], None),
+]
+
+# Appended to each check: report what ended up imported
+_REPORT = "\nimport json as _json, sys as _sys\n_sys.stderr.write('\\n' + _json.dumps(sorted(_sys.modules)) + '\\n')"
+
+
+def _child_env():
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.getenv("PYTHONPATH")])))
+
+
+def run_setup(code: str, cwd: str):
+    process = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=_child_env(), capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+
+
+def run_check(code: str, cwd: str) -> tuple[float, set]:
+    env = _child_env()
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", code + _REPORT], cwd=cwd, env=env,
+                             capture_output=True, text=True)
+    elapsed = (time.perf_counter() - started) * 1000
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+    modules = json.loads(process.stderr.strip().splitlines()[-1])
+    return elapsed, {module.split(".")[0] for module in modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every budget by this factor")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per check; the fastest counts")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, code, budget, forbidden, setup in CHECKS:
+        budget *= args.scale
+        # A fresh working directory per check, so `list` sees no stray index files and nothing lands in the repo
+        with tempfile.TemporaryDirectory(prefix="rag-import-") as cwd:
+            try:
+                if setup:
+                    run_setup(setup, cwd)
+                runs = [run_check(code, cwd) for _ in range(args.repeat)]
+            except RuntimeError as e:
+                print(f"❌ {name}: failed\n{e}")
+                failures += 1
+                continue
+        elapsed = min(ms for ms, _ in runs)
+        leaked = sorted(set(forbidden) & runs[0][1])
+        ok = elapsed <= budget and not leaked
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name:<30} {elapsed:7.0f} ms (budget {budget:.0f} ms)"
+              + (f"  imported: {', '.join(leaked)}" if leaked else ""))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+import numpy as np
+
+
+class LocalPinecone:
+    """In-memory stand-in for the Pinecone client, for benchmarking PineconeVectorDB offline.
+
+    Implements the calls PineconeVectorDB makes (cosine metric only). `latency` seconds are slept
+    per request to approximate the network round-trip of the hosted service.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.indexes = {}
+
+    def list_indexes(self):
+        return [SimpleNamespace(name=name) for name in self.indexes]
+
+    def create_index(self, name, dimension, metric="cosine", spec=None):
+        self.indexes[name] = LocalIndex(dimension, self.latency)
+
+    def describe_index(self, name):
+        return SimpleNamespace(name=name, dimension=self.indexes[name].dimension)
+
+    def Index(self, name):
+        return self.indexes[name]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(index.nbytes for index in self.indexes.values())
+
+
+class LocalIndex:
+    def __init__(self, dimension: int, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.ids = []
+        self.rows = {}  # id -> row in vectors
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.metadata = []
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors):
+        self._round_trip()
+        fresh = [item for item in vectors if item["id"] not in self.rows]
+        matrix = np.asarray([item["values"] for item in vectors], dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        if fresh:
+            self.vectors = np.vstack([self.vectors, np.zeros((len(fresh), self.dimension), dtype=np.float32)])
+        for item, vector in zip(vectors, matrix):
+            row = self.rows.get(item["id"])
+            if row is None:
+                row = self.rows[item["id"]] = len(self.ids)
+                self.ids.append(item["id"])
+                self.metadata.append(None)
+            self.vectors[row] = vector
+            self.metadata[row] = dict(item.get("metadata") or {})
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=10, include_metadata=False):
+        self._round_trip()
+        if not self.ids:
+            return {"matches": []}
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.vectors @ (query / norm if norm else query)
+        top_k = min(top_k, len(self.ids))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return {"matches": [
+            {"id": self.ids[row], "score": float(scores[row]),
+             "metadata": self.metadata[row] if include_metadata else None}
+            for row in best
+        ]}
+
+    def list(self, prefix="", limit=100):
+        self._round_trip()
+        ids = [id for id in self.ids if id.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def delete(self, ids):
+        self._round_trip()
+        for id in ids:
+            row = self.rows.pop(id, None)
+            if row is None:
+                continue
+            # Move the last row into the hole
+            last = len(self.ids) - 1
+            if row != last:
+                self.ids[row], self.metadata[row] = self.ids[last], self.metadata[last]
+                self.vectors[row] = self.vectors[last]
+                self.rows[self.ids[row]] = row
+            self.ids.pop()
+            self.metadata.pop()
+            self.vectors = self.vectors[:last]
+
+    def update(self, id, set_metadata=None):
+        self._round_trip()
+        row = self.rows.get(id)
+        if row is not None and set_metadata:
+            self.metadata[row].update(set_metadata)
+
+    def fetch(self, ids):
+        self._round_trip()
+        return {"vectors": {
+            id: {"id": id, "values": self.vectors[self.rows[id]].tolist(), "metadata": self.metadata[self.rows[id]]}
+            for id in ids if id in self.rows
+        }}
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.vectors.nbytes)
@@ -0,0 +1,150 @@
+"""Run one benchmark case (one vector DB, model and corpus size) in the current directory.
+
+Started by `python -m bench` in a fresh process and empty working directory, so peak RSS and the
+on-disk index size belong to this case alone. Usage: python -m bench.run <case.json> <result.json>
+"""
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
+import numpy as np
+
+from bench.corpus import build_corpus, make_queries
+from bench.local_pinecone import LocalPinecone
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else None
+
+
+def _latency_stats(latencies):
+    ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "qps": _rate(len(ms), ms.sum() / 1000),
+    }
+
+
+def _timed_queries(doc_manager, queries, run):
+    latencies = []
+    for query in queries:
+        # Every query pays for its embedding and search, even if the text repeats
+        doc_manager.query_embeddings.clear()
+        doc_manager.query_results.clear()
+        started = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - started)
+    return _latency_stats(latencies)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def run_case(db: str, model: str, corpus_dir: str, num_docs: int, num_queries: int = 200, top_k: int = 5,
+             pinecone_latency: float = 0.0) -> dict:
+    from embedding_model import EmbeddingModel
+    from document_manager import DocumentManager
+    from file_utils import load_file
+
+    files = build_corpus(corpus_dir, num_docs)
+    queries = make_queries(num_queries, num_docs)
+    result = {"db": db, "model": model, "docs": num_docs, "queries": len(queries), "top_k": top_k}
+
+    started = time.perf_counter()
+    # No embedding cache: every chunk goes through the model
+    embedding_model = EmbeddingModel(model, cache_path=None)
+    client = LocalPinecone(latency=pinecone_latency) if db == "pinecone" else None
+    doc_manager = DocumentManager(db, model, db_options={"client": client} if client else None,
+                                  embedding_model=embedding_model)
+    # Both load lazily; pay for them here rather than in the first timed stage
+    embedding_model.load()
+    doc_manager.open_vector_db()
+    result["startup_s"] = time.perf_counter() - started
+
+    # Ingest stage by stage, the same work ingest_file does for each file
+    started = time.perf_counter()
+    texts = [load_file(path) for path in files]
+    load_s = time.perf_counter() - started
+    chars = sum(len(text) for text in texts)
+
+    started = time.perf_counter()
+    chunks = [doc_manager.chunker.chunk(text) for text in texts]
+    chunk_s = time.perf_counter() - started
+    flat = [chunk for file_chunks in chunks for chunk in file_chunks]
+
+    started = time.perf_counter()
+    embeddings = doc_manager.embed_chunks(flat)
+    embed_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    offset = 0
+    with doc_manager.deferred_writes():
+        for path, text, file_chunks in zip(files, texts, chunks):
+            plan = doc_manager._plan_ingest(os.path.abspath(path), hashlib.md5(text.encode("utf-8")).hexdigest(),
+                                            file_chunks)
+            doc_manager._commit_ingest(plan, embeddings[offset:offset + len(file_chunks)])
+            offset += len(file_chunks)
+    write_s = time.perf_counter() - started
+
+    result["ingest"] = {
+        "files": len(files),
+        "chars": chars,
+        "chunks": len(flat),
+        "load": {"seconds": load_s, "files_per_s": _rate(len(files), load_s), "mb_per_s": _rate(chars / 1e6, load_s)},
+        "chunk": {"seconds": chunk_s, "chunks_per_s": _rate(len(flat), chunk_s)},
+        "embed": {"seconds": embed_s, "chunks_per_s": _rate(len(flat), embed_s)},
+        "write": {"seconds": write_s, "chunks_per_s": _rate(len(flat), write_s)},
+        "total_s": load_s + chunk_s + embed_s + write_s,
+    }
+
+    doc_manager.warm_up()
+    vectors = embedding_model.embed_queries(queries, normalize=doc_manager._normalize)
+    search_latencies = []
+    for vector in vectors:
+        started = time.perf_counter()
+        doc_manager.vector_db.query_batch(vector[None, :], top_k=top_k)
+        search_latencies.append(time.perf_counter() - started)
+    result["query"] = {
+        # End to end: query embedding + vector search
+        "vector": _timed_queries(doc_manager, queries, lambda query: doc_manager.query(query, top_k=top_k)),
+        # The vector DB alone, with precomputed query embeddings
+        "search": _latency_stats(search_latencies),
+        "hybrid": _timed_queries(doc_manager, queries, lambda query: doc_manager.hybrid_query(query, top_k=top_k)),
+    }
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["index_bytes"] = _dir_size(os.getcwd())
+    if client is not None:
+        result["remote_index_bytes"] = client.nbytes  # vectors held by the stand-in, not on disk
+    return result
+
+
+def main():
+    case_path, result_path = sys.argv[1:3]
+    with open(case_path) as f:
+        case = json.load(f)
+    result = run_case(**case)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
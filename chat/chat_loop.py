@@ -1,12 +1,18 @@
 from document_manager import DocumentManager
 from chat.interface import LLMInterface
+from rag_prompt import pack_context, load_prompt_tokenizer
+from answer_cache import SemanticAnswerCache
+from llm_api import API_URL
 
 def chat_loop():
     db_type = input("🗃️ Choose vector DB (pinecone/faiss/chroma): ").strip().lower()
     model_name = input("🤖 Enter embedding model (e.g., all-MiniLM-L6-v2): ").strip()
 
     doc_manager = DocumentManager(db_type=db_type, model_name=model_name)
-    llm = LLMInterface()
+    # Repeat questions in the session are answered from memory instead of the LLM
+    llm = LLMInterface(answer_cache=SemanticAnswerCache(doc_manager.embed_query,
+                                                        namespace=f"{db_type}|{model_name}|{API_URL}"))
+    tokenizer = load_prompt_tokenizer() or doc_manager.chunker.tokenizer
 
     print("\n💬 Ask questions (type 'exit' to quit):")
     while True:
@@ -16,7 +22,9 @@ def chat_loop():
             break
 
         results = doc_manager.query(query, top_k=3)
-        context = "\n".join([f"- {r['file_path']}" for r in results])
+        context = pack_context(results, tokenizer)
 
-        answer = llm.ask(query, context=context)
-        print(f"\n🤖 LLM: {answer}")
+        print("\n🤖 LLM: ", end="", flush=True)
+        for token in llm.ask_stream(query, context=context, sources=results):
+            print(token, end="", flush=True)
+        print(" ⚡ (cached)" if llm.last_cached else "")
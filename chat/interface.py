@@ -1,11 +1,21 @@
-from llm_api import generate_from_api
+import time
+import metrics
+from llm_api import generate_from_api, stream_from_api
 
 class LLMInterface:
-    def __init__(self):
+    """Asks the LLM with retrieved context; an optional SemanticAnswerCache answers repeat questions.
+
+    Pass the retrieved chunks (query results) as `sources` to use the cache; without them every
+    question goes to the model.
+    """
+    def __init__(self, answer_cache=None):
         self.history = []
+        self.answer_cache = answer_cache
+        self.last_cached = False  # whether the latest answer came from the cache
 
-    def ask(self, question: str, context: str = "") -> str:
-        prompt = f"""Answer the following question based on the provided context.
+    @staticmethod
+    def _prompt(question: str, context: str) -> str:
+        return f"""Answer the following question based on the provided context.
 
 Context:
 {context}
@@ -13,6 +23,43 @@ Context:
 Question: {question}
 Answer:"""
 
-        response = generate_from_api(prompt)
+    def _cached(self, question, sources):
+        if self.answer_cache is None or sources is None:
+            return None
+        with metrics.span("answer_cache.lookup"):
+            answer = self.answer_cache.get(question, sources)
+        metrics.count("answer_cache_lookups", result="miss" if answer is None else "hit")
+        return answer
+
+    def _remember(self, question, sources, response, started):
+        if self.answer_cache is not None and sources is not None:
+            self.answer_cache.put(question, sources, response, latency=time.perf_counter() - started)
+
+    def ask(self, question: str, context: str = "", sources=None) -> str:
+        response = self._cached(question, sources)
+        self.last_cached = response is not None
+        if response is None:
+            started = time.perf_counter()
+            with metrics.span("llm.answer"):
+                response = generate_from_api(self._prompt(question, context))
+            self._remember(question, sources, response, started)
         self.history.append({"question": question, "response": response})
         return response
+
+    def ask_stream(self, question: str, context: str = "", sources=None):
+        """Like ask(), but yields the answer token by token; history is updated once it completes."""
+        cached = self._cached(question, sources)
+        self.last_cached = cached is not None
+        if cached is not None:
+            yield cached
+            self.history.append({"question": question, "response": cached})
+            return
+        started = time.perf_counter()
+        tokens = []
+        with metrics.span("llm.answer"):
+            for token in stream_from_api(self._prompt(question, context)):
+                tokens.append(token)
+                yield token
+        response = "".join(tokens)
+        self._remember(question, sources, response, started)
+        self.history.append({"question": question, "response": response})
@@ -1,75 +1,157 @@
-import nltk
-from nltk.tokenize import sent_tokenize
-from transformers import AutoTokenizer
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 
-nltk.download("punkt")
-
-# Token limit mapping for embedding models
+# Fallback sequence limits (tokens, including special tokens) when the model does not report one
 MODEL_TOKEN_LIMITS = {
-    "all-MiniLM-L6-v2": 384,
+    "all-MiniLM-L6-v2": 256,
     "all-mpnet-base-v2": 384,
-    "distilbert-base-nli-stsb-mean-tokens": 512,
-    "bert-base-nli-mean-tokens": 512,
-    "roberta-base-nli-mean-tokens": 512
+    "distilbert-base-nli-stsb-mean-tokens": 128,
+    "bert-base-nli-mean-tokens": 128,
+    "roberta-base-nli-mean-tokens": 128
 }
 
-def chunk_text_semantic(text: str, model_name: str = "all-MiniLM-L6-v2", overlap: int = 20):
+
+@lru_cache(maxsize=1)
+def _sentence_splitter():
+    """Load the Punkt sentence splitter once, downloading its data on first use only."""
+    import nltk
+    from nltk.tokenize.punkt import PunktSentenceTokenizer, PunktTokenizer
+
+    try:
+        nltk.data.find("tokenizers/punkt_tab/english/")
+    except LookupError:
+        nltk.download("punkt_tab", quiet=True)
+    try:
+        return PunktTokenizer("english")
+    except LookupError:
+        print("⚠️ NLTK punkt data unavailable, using untrained sentence splitter.")
+        return PunktSentenceTokenizer()
+
+
+class Chunker:
+    """Sentence-aware, token-limited chunker that keeps its tokenizer and sentence splitter loaded.
+
+    Each document is tokenized once with an offset mapping; chunks are sliced out of the original
+    text at token offsets, so no text is re-encoded or decoded per chunk.
+    """
+    def __init__(self, tokenizer, max_tokens: int, overlap: int = 20):
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("Chunker needs a fast (Rust) tokenizer for offset mappings.")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = min(overlap, max_tokens // 2)
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, max_tokens: int = None, overlap: int = 20):
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if max_tokens is None:
+            limit = MODEL_TOKEN_LIMITS.get(model_name.split("/")[-1], 512)
+            max_tokens = limit - tokenizer.num_special_tokens_to_add()
+        return cls(tokenizer, max_tokens, overlap)
+
+    @classmethod
+    def for_model(cls, model, overlap: int = 20):
+        """Build a chunker from a loaded SentenceTransformer, honouring its max_seq_length."""
+        from transformers import AutoTokenizer
+
+        # A tokenizer of its own: encode() switches the model's tokenizer to truncate at max_seq_length,
+        # so sharing it with workers that embed concurrently could cut documents short or raise
+        # "Already borrowed" from the Rust tokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model.tokenizer.name_or_path, use_fast=True)
+        max_tokens = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+        return cls(tokenizer, max_tokens, overlap)
+
+    @property
+    def spec(self) -> tuple:
+        """Picklable (tokenizer name, max_tokens, overlap) for rebuilding this chunker in another process."""
+        return self.tokenizer.name_or_path, self.max_tokens, self.overlap
+
+    def chunk(self, text: str) -> list[str]:
+        chunks = (text[start:end].strip() for start, end in self._spans(text))
+        return [c for c in chunks if c]
+
+    def chunk_stream(self, blocks, window_chars: int = 1 << 20):
+        """Chunk an iterable of text blocks, holding only about `window_chars` of text at a time."""
+        buffer = ""
+        for block in blocks:
+            buffer += block
+            if len(buffer) < window_chars:
+                continue
+            spans = self._spans(buffer)
+            # The last chunk may continue in the next block: carry it over and re-chunk it with more text
+            for start, end in spans[:-1]:
+                chunk = buffer[start:end].strip()
+                if chunk:
+                    yield chunk
+            buffer = buffer[spans[-1][0]:] if spans else ""
+        for start, end in self._spans(buffer):
+            chunk = buffer[start:end].strip()
+            if chunk:
+                yield chunk
+
+    def _spans(self, text: str) -> list[tuple[int, int]]:
+        """Character (start, end) of every chunk in text."""
+        encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        offsets = encoding["offset_mapping"]
+        if not offsets:
+            return []
+        starts = [start for start, _ in offsets]
+        ends = [end for _, end in offsets]
+
+        # Token range [first, last) of every sentence
+        sentences = []
+        for sent_start, sent_end in _sentence_splitter().span_tokenize(text):
+            first, last = bisect_left(ends, sent_start + 1), bisect_right(starts, sent_end - 1)
+            if first < last:
+                sentences.append((first, last))
+
+        max_tokens, overlap = self.max_tokens, self.overlap
+        spans = []
+        chunk_start = chunk_end = None
+        for first, last in sentences:
+            # A sentence longer than the limit is split hard at the token limit
+            if last - first > max_tokens:
+                if chunk_start is not None:
+                    spans.append((chunk_start, chunk_end))
+                    chunk_start = None
+                print(f"⚠️ Sentence exceeds model token limit ({last - first} > {max_tokens}), splitting directly.")
+                spans.extend((i, min(i + max_tokens, last)) for i in range(first, last, max_tokens))
+                continue
+
+            if chunk_start is not None and last - chunk_start > max_tokens:
+                spans.append((chunk_start, chunk_end))
+                # Start the next chunk with the last `overlap` tokens of the previous one
+                chunk_start = max(chunk_end - overlap, chunk_start) if overlap > 0 else first
+                if last - chunk_start > max_tokens:
+                    chunk_start = first
+            if chunk_start is None:
+                chunk_start = first
+            chunk_end = last
+        if chunk_start is not None:
+            spans.append((chunk_start, chunk_end))
+
+        return [(starts[a], ends[b - 1]) for a, b in spans]
+
+
+@lru_cache(maxsize=4)
+def get_chunker(model_name: str, max_tokens: int = None, overlap: int = 20) -> Chunker:
+    """Process-wide cached Chunker, so the tokenizer is loaded once per model."""
+    return Chunker.from_pretrained(model_name, max_tokens, overlap)
+
+
+def chunk_text_semantic(text: str, model_name: str = "all-MiniLM-L6-v2", overlap: int = 20, max_tokens: int = None):
     """
     Splits text into semantically meaningful chunks using sentence boundaries + token-aware limits.
 
     Args:
         text (str): Full input text.
-        model_name (str): Embedding model name.
+        model_name (str): Tokenizer / embedding model name.
         overlap (int): Number of tokens to overlap between chunks.
+        max_tokens (int): Token limit per chunk; defaults to the model's limit.
 
     Returns:
         List[str]: List of text chunks ready for embedding.
     """
-    max_tokens = MODEL_TOKEN_LIMITS.get(model_name, 512)
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    sentences = sent_tokenize(text)
-
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
-
-    for sentence in sentences:
-        if not sentence.strip():
-            continue
-
-        sentence_tokens = tokenizer.encode(sentence, add_special_tokens=False)
-        token_len = len(sentence_tokens)
-
-        # If sentence alone is too long, split it hard
-        if token_len > max_tokens:
-            print(f"⚠️ Sentence exceeds model token limit ({token_len} > {max_tokens}), splitting directly.")
-            for i in range(0, token_len, max_tokens):
-                part_tokens = sentence_tokens[i:i + max_tokens]
-                part_text = tokenizer.decode(part_tokens)
-                chunks.append(part_text.strip())
-            continue
-
-        # If adding sentence exceeds limit, save chunk
-        if current_tokens + token_len > max_tokens:
-            chunk_text = tokenizer.decode(tokenizer.encode(" ".join(current_chunk), add_special_tokens=False))
-            chunks.append(chunk_text.strip())
-
-            # Start new chunk with overlap from end of previous chunk
-            if overlap > 0:
-                overlap_tokens = tokenizer.encode(" ".join(current_chunk), add_special_tokens=False)[-overlap:]
-                current_chunk = [tokenizer.decode(overlap_tokens)]
-                current_tokens = len(overlap_tokens)
-            else:
-                current_chunk = []
-                current_tokens = 0
-
-        # Append sentence to current chunk
-        current_chunk.append(sentence)
-        current_tokens += token_len
-
-    # Final chunk
-    if current_chunk:
-        chunk_text = tokenizer.decode(tokenizer.encode(" ".join(current_chunk), add_special_tokens=False))
-        chunks.append(chunk_text.strip())
-
-    return chunks
+    return get_chunker(model_name, max_tokens, overlap).chunk(text)
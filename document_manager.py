@@ -1,216 +1,606 @@
-import os, time, json, hashlib, re
+import os, hashlib, re, threading
+from collections import deque
+from contextlib import contextmanager
 import numpy as np
 from embedding_model import EmbeddingModel
-from vector_db import PineconeVectorDB, FaissVectorDB, ChromaVectorDB
-from file_utils import load_file
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-from chunker import chunk_text_semantic
-
-
-class WatcherHandler(FileSystemEventHandler):
-    def __init__(self, doc_manager):
-        self.doc_manager = doc_manager
-        self.processed_files = set()
-
-    def on_created(self, event):
-        if event.is_directory:
-            return
-        path = os.path.abspath(event.src_path)
-        if os.path.basename(path).lower() in ("desktop.ini", ".ds_store"):
-            return
-        print(f"🌟 File created: {os.path.basename(path)}")
-
-        for i in range(5):
-            try:
-                with open(path, "rb"):
-                    break
-            except (PermissionError, OSError):
-                print(f"🔒 File still locked ({i+1}/5): {os.path.basename(path)}")
-                time.sleep(1)
-        else:
-            print(f"❌ Skipping file - still locked: {os.path.basename(path)}")
-            return
-
-        self.doc_manager.ingest_file(path)
-        self.processed_files.add(path)
-
-    def on_modified(self, event):
-        if event.is_directory:
-            return
-        path = os.path.abspath(event.src_path)
-        if os.path.basename(path).lower() in ("desktop.ini", ".ds_store"):
-            return
-        print(f"✏️ File modified: {os.path.basename(path)}")
-
-        for i in range(5):
-            try:
-                with open(path, "rb"):
-                    break
-            except (PermissionError, OSError):
-                print(f"🔒 File still locked ({i+1}/5): {os.path.basename(path)}")
-                time.sleep(1)
-        else:
-            print(f"❌ Skipping file - still locked: {os.path.basename(path)}")
-            return
-
-        self.doc_manager.ingest_file(path)
-        self.processed_files.add(path)
-
-    def on_deleted(self, event):
-        if event.is_directory:
-            return
-        path = os.path.abspath(event.src_path)
-        print(f"🗑️ File deleted: {os.path.basename(path)}")
-        self.doc_manager.delete_document(path)
+from vector_db import BACKENDS, get_backend
+from vector_db.faiss_layout import memory_estimate as faiss_memory_estimate
+from file_utils import load_file_with_retry, iter_file_blocks, hash_blocks, retry_locked
+from chunker import Chunker
+from metadata_store import MetadataStore
+from query_cache import LRUCache
+from query_batcher import QueryBatcher
+from lexical_index import BM25Index
+import metrics
 
 
 class DocumentManager:
-    def __init__(self, db_type: str, model_name: str):
+    def __init__(self, db_type: str, model_name: str, db_options: dict = None, embedding_model: EmbeddingModel = None):
         self.db_type = db_type.lower()
-        self.embedding_model = EmbeddingModel(model_name)
-        embed_dim = self.embedding_model.dim
+        self.model_name = model_name
+        # An already loaded model can be shared between managers for different vector DBs.
+        # Models, backends and the chunker are loaded on first use, so e.g. listing documents stays cheap.
+        self.embedding_model = embedding_model or EmbeddingModel(model_name)
+        self.embed_dim = self.embedding_model.dim
 
         safe_name = re.sub(r'[^a-z0-9\-]', '-', model_name.lower())
-        index_name = f"{safe_name}-{embed_dim}" if self.db_type == "pinecone" else f"{self.db_type}_{safe_name}_{embed_dim}"
+        index_name = f"{safe_name}-{self.embed_dim}" if self.db_type == "pinecone" else f"{self.db_type}_{safe_name}_{self.embed_dim}"
+        self.index_name = index_name
 
-        if self.db_type == "pinecone":
-            self.vector_db = PineconeVectorDB(index_name=index_name, dimension=embed_dim)
-        elif self.db_type == "faiss":
-            self.vector_db = FaissVectorDB(dimension=embed_dim, model_name=model_name)
-        elif self.db_type == "chroma":
-            self.vector_db = ChromaVectorDB(collection_name=index_name)
-        else:
+        if self.db_type not in BACKENDS:
             raise ValueError(f"Unsupported vector DB type: {db_type}")
-
-        self.meta_file = f"{index_name}_meta.json"
-        self._load_metadata()
-        self._id_counter = max(self.path_to_id.values(), default=0) if self.db_type == "faiss" else 0
+        # Backend-specific settings (e.g. batch_size) are passed straight to the vector DB constructor
+        self.db_options = db_options or {}
+        self._vector_db = None
+        self._chunker = None
+
+        self.metadata = MetadataStore(f"{index_name}_meta.sqlite")
+        legacy_meta = f"{index_name}_meta.json"
+        if os.path.exists(legacy_meta) and not len(self.metadata):
+            count = self.metadata.import_json(legacy_meta)
+            print(f"📦 Migrated {count} documents from {legacy_meta} to {self.metadata.path}")
+        self._id_counter = self.metadata.max_int_id() if self.db_type == "faiss" else 0
+        # Keyword (BM25) index over the same chunks, for hybrid retrieval
+        self.lexical = BM25Index(f"{index_name}_bm25.sqlite")
+        if len(self.metadata) and not len(self.lexical):
+            print("ℹ️ Keyword index is empty; run `main.py reindex-lexical` to enable hybrid search for existing files")
         self._normalize = (self.db_type == "faiss")
-
-    def _load_metadata(self):
-        if os.path.exists(self.meta_file):
-            with open(self.meta_file, "r") as f:
-                data = json.load(f)
-                self.path_to_id = data.get("path_to_id", {})
-                self.id_to_path = data.get("id_to_path", {})
-                self.path_to_hash = data.get("path_to_hash", {})
-                self.hash_to_id = data.get("hash_to_id", {})
-        else:
-            self.path_to_id, self.id_to_path, self.path_to_hash, self.hash_to_id = {}, {}, {}, {}
-
-    def _save_metadata(self):
-        with open(self.meta_file, "w") as f:
-            json.dump({
-                "path_to_id": self.path_to_id,
-                "id_to_path": self.id_to_path,
-                "path_to_hash": self.path_to_hash,
-                "hash_to_id": self.hash_to_id
-            }, f, indent=2)
+        # Files larger than this are parsed, chunked and embedded window by window instead of in one piece
+        self.stream_threshold = 16 << 20
+        self.stream_window = 512  # chunks embedded and written per window
+        # Serializes index and bookkeeping writes when several watcher workers ingest at once
+        self._lock = threading.RLock()
+        # Repeated questions skip the transformer (embedding LRU) and the vector search (result LRU)
+        self.query_embeddings = LRUCache(maxsize=1024)
+        self.query_results = LRUCache(maxsize=256)
+        self._generation = 0
+        # aquery() batches concurrent queries: wait up to batch_wait seconds for up to max_query_batch of them
+        self.batch_wait = 0.005
+        self.max_query_batch = 32
+        self._batcher = None
+
+    @property
+    def vector_db(self):
+        if self._vector_db is None:
+            self.open_vector_db()
+        return self._vector_db
+
+    def open_vector_db(self):
+        """Connect to / open the vector DB now instead of on first use (surfaces configuration errors early)."""
+        with self._lock:
+            if self._vector_db is None:
+                backend = get_backend(self.db_type)  # imports only this backend's client library
+                if self.db_type == "pinecone":
+                    self._vector_db = backend(index_name=self.index_name, dimension=self.embed_dim, **self.db_options)
+                elif self.db_type == "faiss":
+                    self._vector_db = backend(dimension=self.embed_dim, model_name=self.model_name, **self.db_options)
+                else:
+                    self._vector_db = backend(collection_name=self.index_name, **self.db_options)
+        return self._vector_db
+
+    @property
+    def chunker(self) -> Chunker:
+        # Chunk with the embedding model's own tokenizer and sequence limit
+        if self._chunker is None:
+            self._chunker = Chunker.for_model(self.embedding_model.model)
+        return self._chunker
+
+    @property
+    def index_generation(self) -> tuple:
+        """Changes whenever this manager or another process changes what is indexed."""
+        return self._generation, self.metadata.data_version()
+
+    def _index_changed(self):
+        self._generation += 1
+        self.query_results.clear()
+
+    def warm_up(self):
+        """Pay one-off costs (first model inference, lazily opened index) before the first real query."""
+        try:
+            self._search_batch(self.embedding_model.embed_queries(["warm up"], normalize=self._normalize), 1)
+        except Exception as e:
+            print(f"⚠️ Warm-up query failed: {e}")
+
+    def cache_stats(self) -> dict:
+        stats = {"query_embeddings": self.query_embeddings.stats(), "query_results": self.query_results.stats()}
+        if self._batcher is not None:
+            stats["query_batches"] = self._batcher.stats()
+        return stats
+
+    @contextmanager
+    def deferred_writes(self):
+        """Hold back index persistence for a bulk load and group metadata writes into one transaction."""
+        autosave = getattr(self.vector_db, "autosave", None)
+        if not autosave:
+            # Not supported by the backend, or already deferred by an enclosing block
+            with self.metadata.batch(), self.lexical.batch():
+                yield
+            return
+        self.vector_db.autosave = False
+        try:
+            with self.metadata.batch(), self.lexical.batch():
+                yield
+        finally:
+            self.vector_db.autosave = autosave
+            self.vector_db.save()
 
     def ingest_file(self, file_path: str):
         file_path = os.path.abspath(file_path)
-        for i in range(5):
-            try:
-                content = load_file(file_path)
-                break
-            except PermissionError:
-                print(f"🔁 Retry {i+1}/5: File locked - {os.path.basename(file_path)}")
-                time.sleep(1)
-        else:
-            print(f"❌ Could not load file after retries: {file_path}")
+        if os.path.isfile(file_path) and os.path.getsize(file_path) > self.stream_threshold:
+            return self.ingest_file_streaming(file_path)
+        with metrics.span("ingest.load"):
+            content = load_file_with_retry(file_path)
+        if content is None:
             return {"status": "error", "reason": "permission_denied"}
 
         if not content.strip():
             return {"status": "skipped", "reason": "empty_file"}
 
         file_hash = hashlib.md5(content.encode("utf-8")).hexdigest()
-        if file_path in self.path_to_id:
-            old_hash = self.path_to_hash.get(file_path)
-            if old_hash == file_hash:
+        skipped = self._precheck(file_path, file_hash)
+        if skipped:
+            return skipped
+
+        # Parsing, chunking and embedding run outside the lock; only planning and writing are serialized
+        with metrics.span("ingest.chunk"):
+            chunks = self.chunker.chunk(content)
+        with self._lock:
+            skipped = self._precheck(file_path, file_hash)
+            if skipped:
+                return skipped
+            plan = self._plan_ingest(file_path, file_hash, chunks)
+        with metrics.span("ingest.embed"):
+            embeddings = self.embed_chunks(plan["new_texts"])
+        with self._lock, metrics.span("ingest.write"):
+            return self._commit_ingest(plan, embeddings)
+
+    def ingest_file_streaming(self, file_path: str):
+        """Ingest a large file window by window; peak memory is bounded by the window, not the file.
+
+        The file is read twice: a hashing pass (so unchanged files are skipped before any chunking),
+        then a pass that chunks, embeds and writes each window of chunks while parsing continues.
+        Like ingest_file, only planning and writing hold the lock: chunking and embedding a window run
+        outside it, so several watcher workers can stream files in parallel.
+        """
+        file_path = os.path.abspath(file_path)
+        with metrics.span("ingest.hash"):
+            hashed = retry_locked(lambda path: hash_blocks(iter_file_blocks(path)), file_path)
+        if hashed is None:
+            return {"status": "error", "reason": "permission_denied"}
+        file_hash, has_text = hashed
+        if not has_text:
+            return {"status": "skipped", "reason": "empty_file"}
+        skipped = self._precheck(file_path, file_hash)
+        if skipped:
+            return skipped
+
+        with self._lock:
+            skipped = self._precheck(file_path, file_hash)
+            if skipped:
+                return skipped
+            doc_id, old_chunks, replace_all = self._resolve_doc(file_path)
+            if replace_all:
+                self.vector_db.delete_document(doc_id)
+                self.lexical.delete_document(doc_id)
+        pool = {}
+        for chunk_id, chunk_hash in old_chunks:
+            pool.setdefault(chunk_hash, deque()).append(chunk_id)
+        old_positions = {chunk_id: i for i, (chunk_id, _) in enumerate(old_chunks)}
+        stored = []  # [chunk_id, chunk_hash] per chunk, in file order
+        moved_ids, moved_metadatas, last_written = [], [], []
+        added = 0
+
+        chunks = self.chunker.chunk_stream(iter_file_blocks(file_path))
+        while True:
+            window = [chunk for _, chunk in zip(range(self.stream_window), chunks)]
+            if not window:
+                break
+            new_texts, new_metadatas, new_positions = [], [], []
+            for chunk in window:
+                chunk_hash = hashlib.md5(chunk.encode("utf-8")).hexdigest()
+                metadata = self._chunk_metadata(file_path, len(stored), chunk, chunk_hash)
+                if pool.get(chunk_hash):
+                    reused = pool[chunk_hash].popleft()
+                    if old_positions[reused] != len(stored):
+                        moved_ids.append(reused)
+                        moved_metadatas.append(metadata)
+                    stored.append([reused, chunk_hash])
+                    continue
+                new_positions.append(len(stored))
+                new_texts.append(chunk)
+                new_metadatas.append(metadata)
+                stored.append([None, chunk_hash])
+            if not new_texts:
+                continue
+
+            with metrics.span("ingest.embed"):
+                vectors = self.embed_chunks(new_texts)
+            with self._lock, self.deferred_writes(), metrics.span("ingest.write"):
+                # Ids continue after the old chunks, then after the last id written by this ingest
+                chunk_ids = self._new_chunk_ids(doc_id, len(new_texts), last_written or old_chunks)
+                last_written = [[chunk_ids[-1], None]]
+                self.vector_db.add_documents(chunk_ids, vectors, new_metadatas, doc_id=doc_id)
+                self.lexical.add_chunks(chunk_ids, new_texts, doc_id)
+            metrics.count("chunks_written", len(new_texts))
+            for position, chunk_id in zip(new_positions, chunk_ids):
+                stored[position][0] = chunk_id
+            added += len(chunk_ids)
+
+        removed_ids = [chunk_id for ids in pool.values() for chunk_id in ids]
+        with self._lock, self.deferred_writes():
+            if removed_ids:
+                self.vector_db.delete_chunks(removed_ids)
+                self.lexical.delete_chunks(removed_ids)
+            if moved_ids:
+                self.vector_db.update_metadata(moved_ids, moved_metadatas, doc_id=doc_id)
+            self._record_ingest(file_path, file_hash, doc_id, stored)
+
+        return {
+            "status": "ingested",
+            "id": doc_id,
+            "chunks": len(stored),
+            "reused": len(stored) - added,
+            "added": added,
+            "removed": len(removed_ids)
+        }
+
+    def _precheck(self, file_path, file_hash):
+        """Return a "skipped" result if the file needs no work, otherwise None."""
+        record = self.metadata.get(file_path)
+        if record is not None:
+            if record["file_hash"] == file_hash:
                 return {"status": "skipped", "reason": "no_change"}
-            doc_id = self.path_to_id[file_path]
-            self.vector_db.delete_document(doc_id)
-            if old_hash and self.hash_to_id.get(old_hash) == doc_id:
-                del self.hash_to_id[old_hash]
-            new_id = doc_id
+            return None
+        duplicate_of = self.metadata.id_for_hash(file_hash)
+        if duplicate_of is not None:
+            return {"status": "skipped", "reason": "duplicate_content", "duplicate_of": duplicate_of}
+        return None
+
+    def _plan_ingest(self, file_path, file_hash, chunks):
+        """Decide which chunks can be reused and which must be embedded; nothing is written yet."""
+        new_id, old_chunks, replace_all = self._resolve_doc(file_path)
+        chunk_hashes = [hashlib.md5(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+        reused_ids, removed_ids = self._diff_chunks(old_chunks, chunk_hashes)
+        return {
+            "file_path": file_path,
+            "file_hash": file_hash,
+            "doc_id": new_id,
+            "replace_all": replace_all,
+            "chunks": chunks,
+            "chunk_hashes": chunk_hashes,
+            "old_chunks": old_chunks,
+            "reused_ids": reused_ids,
+            "removed_ids": removed_ids,
+            # Only chunks whose text did not exist before are embedded and written
+            "new_texts": [chunk for chunk, reused in zip(chunks, reused_ids) if reused is None]
+        }
+
+    def _resolve_doc(self, file_path):
+        """Doc id for a file (a new one if unseen), its stored chunks, and whether to replace them all."""
+        old_chunks, replace_all = [], False
+        record = self.metadata.get(file_path)
+        if record is not None:
+            doc_id = record["doc_id"]
+            if record["chunks"] is not None:
+                old_chunks = record["chunks"]
+            else:
+                # Indexed before chunk hashes were tracked: nothing to diff against, replace everything
+                replace_all = True
+        elif self.db_type == "faiss":
+            self._id_counter += 1
+            doc_id = self._id_counter
         else:
-            if file_hash in self.hash_to_id:
-                return {"status": "skipped", "reason": "duplicate_content", "duplicate_of": self.hash_to_id[file_hash]}
-            new_id = self._id_counter + 1 if self.db_type == "faiss" else file_path
-            if self.db_type == "faiss":
-                self._id_counter += 1
-
-        chunks = chunk_text_semantic(content, model_name="sentence-transformers/all-MiniLM-L6-v2")
-        embeddings = self.embedding_model.embed_texts(chunks)
-
-        for i, (chunk, vec) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{new_id}_chunk{i}" if self.db_type != "faiss" else self._id_counter + i
-            metadata = {
-                "file": file_path,
-                "chunk_index": i,
-                "chunk_text": chunk[:500],
-                "hash": file_hash
-            }
-
-            if self._normalize:
-                vec = np.array(vec, dtype='float32')
-                norm = np.linalg.norm(vec)
-                if norm != 0:
-                    vec = vec / norm
-                vec = vec.tolist()
-
-            self.vector_db.add_document(chunk_id, vec, metadata=metadata)
-
+            # Other backends use the path as the doc id; a file moved away keeps its id, so don't reuse it
+            doc_id, n = file_path, 1
+            while self.metadata.path_for_id(doc_id) is not None:
+                doc_id, n = f"{file_path}#{n}", n + 1
+        return doc_id, old_chunks, replace_all
+
+    @staticmethod
+    def _chunk_metadata(file_path, chunk_index, chunk, chunk_hash):
+        return {
+            "file": file_path,
+            "chunk_index": chunk_index,
+            "chunk_text": chunk,  # full text: the prompt packer merges neighbouring chunks
+            "chunk_hash": chunk_hash
+        }
+
+    def embed_chunks(self, texts):
+        """Chunk embeddings as stored in this DB: a float32 matrix, L2-normalized for FAISS."""
+        return self.embedding_model.embed_texts(texts, normalize=self._normalize)
+
+    def _record_ingest(self, file_path, file_hash, doc_id, stored_chunks):
+        """Update the path/hash/chunk bookkeeping after a file's chunks were written."""
+        self.metadata.put(file_path, doc_id, file_hash, stored_chunks)
+        self._index_changed()
+        metrics.count("files_ingested")
+
+    def _commit_ingest(self, plan, embeddings):
+        """Write a planned ingest (embeddings cover plan["new_texts"]) and update the bookkeeping."""
+        file_path, file_hash, new_id = plan["file_path"], plan["file_hash"], plan["doc_id"]
+        chunks, chunk_hashes, reused_ids = plan["chunks"], plan["chunk_hashes"], plan["reused_ids"]
+        removed_ids, old_chunks = plan["removed_ids"], plan["old_chunks"]
+
+        if plan["replace_all"]:
+            self.vector_db.delete_document(new_id)
+            self.lexical.delete_document(new_id)
+
+        new_ids = iter(self._new_chunk_ids(new_id, len(plan["new_texts"]), old_chunks))
+        old_positions = {chunk_id: i for i, (chunk_id, _) in enumerate(old_chunks)}
+        chunk_ids, metadatas = [], []
+        moved_ids, moved_metadatas = [], []
+        for i, (chunk, chunk_hash, reused) in enumerate(zip(chunks, chunk_hashes, reused_ids)):
+            metadata = self._chunk_metadata(file_path, i, chunk, chunk_hash)
+            if reused is not None:
+                if old_positions[reused] != i:
+                    moved_ids.append(reused)
+                    moved_metadatas.append(metadata)
+                continue
+
+            # New chunks come in the order of plan["new_texts"], so row i of embeddings is chunk_ids[i]
+            chunk_ids.append(next(new_ids))
+            metadatas.append(metadata)
+
+        if removed_ids:
+            self.vector_db.delete_chunks(removed_ids)
+            self.lexical.delete_chunks(removed_ids)
+        # One bulk write per file: a single index persist for FAISS, batched upserts elsewhere
+        metrics.count("chunks_written", len(chunk_ids))
+        if chunk_ids:
+            self.vector_db.add_documents(chunk_ids, embeddings, metadatas, doc_id=new_id)
+            self.lexical.add_chunks(chunk_ids, plan["new_texts"], new_id)
+        if moved_ids:
+            # Reused chunks keep their vectors; only their position in the file changed
+            self.vector_db.update_metadata(moved_ids, moved_metadatas, doc_id=new_id)
+
+        new_chunk_ids = iter(chunk_ids)
+        self._record_ingest(file_path, file_hash, new_id, [
+            [reused if reused is not None else next(new_chunk_ids), chunk_hash]
+            for reused, chunk_hash in zip(reused_ids, chunk_hashes)
+        ])
+
+        return {
+            "status": "ingested",
+            "id": new_id,
+            "chunks": len(chunks),
+            "reused": len(chunks) - len(chunk_ids),
+            "added": len(chunk_ids),
+            "removed": len(removed_ids)
+        }
+
+    @staticmethod
+    def _diff_chunks(old_chunks, chunk_hashes):
+        """Match new chunks to stored ones by content hash.
+
+        Returns the reused chunk id (or None) for every new chunk, plus the old ids left unmatched.
+        """
+        pool = {}
+        for chunk_id, chunk_hash in old_chunks:
+            pool.setdefault(chunk_hash, deque()).append(chunk_id)
+        reused_ids = [pool[h].popleft() if pool.get(h) else None for h in chunk_hashes]
+        removed_ids = [chunk_id for ids in pool.values() for chunk_id in ids]
+        return reused_ids, removed_ids
+
+    def _new_chunk_ids(self, doc_id, count, old_chunks):
         if self.db_type == "faiss":
-            self._id_counter += len(chunks)
-
-        self.path_to_id[file_path] = new_id
-        self.id_to_path[str(new_id)] = file_path
-        self.path_to_hash[file_path] = file_hash
-        self.hash_to_id[file_hash] = new_id
-        self._save_metadata()
-
-        return {"status": "ingested", "id": new_id, "chunks": len(chunks)}
+            # FAISS chunk ids are integer labels in their own namespace, separate from document ids
+            first_label = self.vector_db.next_id
+            return [first_label + i for i in range(count)]
+        # Other backends use "<doc_id>_chunk<n>"; continue numbering after the ids still in use
+        used = [int(str(chunk_id).rsplit("_chunk", 1)[1]) for chunk_id, _ in old_chunks]
+        first = max(used, default=-1) + 1
+        return [f"{doc_id}_chunk{first + i}" for i in range(count)]
 
     def delete_document(self, file_path: str):
-        file_path = os.path.abspath(file_path)
-        if file_path not in self.path_to_id:
+        with self._lock:
+            return self._delete_document(os.path.abspath(file_path))
+
+    def _delete_document(self, file_path: str):
+        record = self.metadata.get(file_path)
+        if record is None:
             return {"status": "error", "reason": "not_found"}
 
-        doc_id = self.path_to_id[file_path]
+        doc_id = record["doc_id"]
         self.vector_db.delete_document(doc_id)
+        self.lexical.delete_document(doc_id)
+        self.metadata.delete(file_path)
+        self._index_changed()
+        return {"status": "deleted", "id": doc_id}
 
-        file_hash = self.path_to_hash.get(file_path)
-        if file_hash and self.hash_to_id.get(file_hash) == doc_id:
-            del self.hash_to_id[file_hash]
+    def move_document(self, src_path: str, dest_path: str):
+        """Re-point an indexed file at its new path; its vectors and doc id are kept as they are."""
+        src_path, dest_path = os.path.abspath(src_path), os.path.abspath(dest_path)
+        with self._lock:
+            record = self.metadata.get(src_path)
+            if record is None:
+                return {"status": "error", "reason": "not_found"}
+            if dest_path in self.metadata:
+                # The move overwrote another indexed file
+                self._delete_document(dest_path)
+            self.metadata.move(src_path, dest_path)
+            self._index_changed()  # cached results carry the old file_path
+        return {"status": "moved", "id": record["doc_id"]}
 
-        del self.path_to_id[file_path]
-        del self.path_to_hash[file_path]
-        if str(doc_id) in self.id_to_path:
-            del self.id_to_path[str(doc_id)]
+    def list_documents(self):
+        return self.metadata.paths()
 
-        self._save_metadata()
-        return {"status": "deleted", "id": doc_id}
+    def memory_estimate(self):
+        """Approximate RAM of the stored vectors: per layout and precision for FAISS, raw float32 otherwise.
 
-    def list_documents(self):
-        return sorted(self.path_to_id.keys())
+        An open FAISS index reports its built layout; otherwise the estimate comes from the chunk count and
+        the configured layout (flat/fp32 by default), so listing never loads faiss or the index.
+        """
+        if self.db_type == "faiss" and self._vector_db is not None:
+            return self._vector_db.memory_estimate()
+        chunks = self.metadata.chunk_count()
+        if self.db_type == "faiss":
+            if not chunks:
+                return None
+            options = self.db_options
+            index_type = options.get("index_type") or "flat"
+            precision = "pq" if index_type == "ivf_pq" else options.get("precision") or "fp32"
+            if index_type == "ivf_flat" and precision == "pq":
+                index_type = "ivf_pq"
+            sizes = {key: options[key] for key in ("nlist", "hnsw_m", "pq_m") if options.get(key)}
+            return faiss_memory_estimate(chunks, self.embed_dim, index_type, precision, **sizes)
+        return {"layout": f"{self.db_type}/fp32", "vectors": chunks, "dimension": self.embed_dim,
+                "bytes": chunks * self.embed_dim * 4, "by_precision": None}
 
     def query(self, query_text: str, top_k: int = 5):
-        query_embedding = self.embedding_model.embed_text(query_text)
-        if self._normalize:
-            vec = np.array(query_embedding, dtype='float32')
-            norm = np.linalg.norm(vec)
-            if norm != 0:
-                vec = vec / norm
-            query_embedding = vec.tolist()
-
-        return self.vector_db.query(query_embedding, top_k=top_k)
+        return self.query_batch([query_text], top_k=top_k)[0]
+
+    def _query_vectors(self, query_texts):
+        """(vector, bytes) per query text, from the embedding LRU or one encode call for the misses."""
+        model_name = self.embedding_model.model_name
+        text_keys = [(model_name, " ".join(text.split())) for text in query_texts]
+        cached = [self.query_embeddings.get(key) for key in text_keys]
+        missing = list(dict.fromkeys(key for key, hit in zip(text_keys, cached) if hit is None))
+        if missing:
+            matrix = self.embedding_model.embed_queries([text for _, text in missing], normalize=self._normalize)
+            encoded = {key: (row, row.tobytes()) for key, row in zip(missing, matrix)}
+            for key, value in encoded.items():
+                self.query_embeddings.put(key, value)
+            cached = [encoded[key] if hit is None else hit for key, hit in zip(text_keys, cached)]
+        return cached
+
+    def embed_query(self, query_text: str):
+        """Query embedding as used for search (cached, so embedding a just-searched question is free)."""
+        return self._query_vectors([query_text])[0][0]
+
+    def query_batch(self, query_texts: list[str], top_k: int = 5):
+        """Answer many queries at once: one encode call for the uncached texts, one batched search."""
+        metrics.count("queries", len(query_texts))
+        with metrics.span("query.embed"):
+            cached = self._query_vectors(query_texts)
+
+        # Read the generation before searching so a result racing with a write is never cached as current
+        generation = self.index_generation
+        result_keys = [(embedding_key, top_k, generation) for _, embedding_key in cached]
+        results = [self.query_results.get(key) for key in result_keys]
+        todo = {}  # result key -> query vector, each distinct query searched once
+        for key, (vector, _), hit in zip(result_keys, cached, results):
+            if hit is None:
+                todo.setdefault(key, vector)
+        if todo:
+            with metrics.span("query.search"):
+                found = dict(zip(todo, self._search_batch(np.stack(list(todo.values())), top_k)))
+            for key, value in found.items():
+                self.query_results.put(key, value)
+            results = [found[key] if hit is None else hit for key, hit in zip(result_keys, results)]
+        # Callers may annotate the result dicts; keep the cached ones pristine
+        return [[dict(res) for res in query_results] for query_results in results]
+
+    async def aquery(self, query_text: str, top_k: int = 5):
+        """Async query; concurrent calls are micro-batched into one encode and one search."""
+        return await self.batcher.aquery(query_text, top_k)
+
+    @property
+    def batcher(self):
+        with self._lock:
+            if self._batcher is None:
+                self._batcher = QueryBatcher(self.query_batch, max_wait=self.batch_wait, max_batch=self.max_query_batch)
+            return self._batcher
+
+    def _search_batch(self, matrix, top_k):
+        batch_results = self.vector_db.query_batch(matrix, top_k=top_k)
+        for results in batch_results:
+            self._resolve_paths(results)
+        return batch_results
+
+    def _resolve_paths(self, results):
+        for res in results:
+            metadata = res.get("metadata") or {}
+            # The path map follows moves; the "file" stored with each chunk is the path at ingest time
+            doc_id = res.get("doc_id")
+            if self.db_type == "faiss" and doc_id is not None:
+                doc_id = int(doc_id)  # the FAISS sidecar stores doc ids as text
+            res["file_path"] = self.metadata.path_for_id(doc_id) or metadata.get("file", "")
+        return results
+
+    def hybrid_query(self, query_text: str, top_k: int = 5, candidates: int = None, rrf_k: int = 60,
+                     batched: bool = False):
+        """Vector and BM25 keyword results merged by reciprocal-rank fusion.
+
+        Each side contributes its best `candidates` chunks; a chunk scores sum(1 / (rrf_k + rank)) over
+        the lists it appears in, so exact identifiers found only by keywords still make the cut.
+        `batched` routes the vector half through the shared micro-batcher.
+        """
+        candidates = candidates or max(4 * top_k, 20)
+        with metrics.span("query.vector"):
+            if batched:
+                vector_results = self.batcher.query(query_text, top_k=candidates)
+            else:
+                vector_results = self.query(query_text, top_k=candidates)
+        with metrics.span("query.bm25"):
+            keyword_results = self.lexical.search(query_text, top_k=candidates)
+        with metrics.span("query.fuse"):
+            return self._fuse(vector_results, keyword_results, top_k, rrf_k)
+
+    def _fuse(self, vector_results, keyword_results, top_k, rrf_k):
+        """Reciprocal-rank fusion of the two result lists (see hybrid_query)."""
+        fused = {}
+        for rank, res in enumerate(vector_results, 1):
+            res["vector_score"] = res["score"]
+            fused[res["id"]] = (1.0 / (rrf_k + rank), res)
+        missing = []
+        for rank, hit in enumerate(keyword_results, 1):
+            score, res = fused.get(hit["id"], (0.0, None))
+            if res is None:
+                res = {"id": hit["id"], "doc_id": hit["doc_id"]}
+                missing.append(res)
+            res["bm25_score"] = hit["score"]
+            fused[hit["id"]] = (score + 1.0 / (rrf_k + rank), res)
+
+        ranked = sorted(fused.values(), key=lambda item: item[0], reverse=True)
+        # Keyword-only hits need their stored metadata (one lookup for all of them); hits gone from the
+        # vector store are dropped before cutting to top_k, so they don't cost the caller results
+        if missing:
+            stored = {chunk["id"]: chunk for chunk in self.vector_db.get_chunks([res["id"] for res in missing])}
+            for res in missing:
+                res["metadata"] = (stored.get(res["id"]) or {}).get("metadata") or {}
+            self._resolve_paths([res for res in missing if res["id"] in stored])
+        results = []
+        for score, res in ranked:
+            if "file_path" not in res:
+                continue  # indexed by keywords but gone from the vector store
+            res["score"] = score
+            results.append(res)
+            if len(results) == top_k:
+                break
+        return results
+
+    def rebuild_lexical_index(self):
+        """Rebuild the keyword index from the indexed files on disk (e.g. for files ingested before it existed)."""
+        with self._lock:
+            self.lexical.clear()
+            indexed, missing = 0, 0
+            with self.lexical.batch():
+                for file_path in self.metadata.paths():
+                    record = self.metadata.get(file_path)
+                    content = load_file_with_retry(file_path) if os.path.isfile(file_path) else None
+                    if not content or record["chunks"] is None:
+                        missing += 1
+                        continue
+                    # Chunking is deterministic, so the current chunks line up with the stored hashes
+                    by_hash = {}
+                    for chunk in self.chunker.chunk(content):
+                        by_hash.setdefault(hashlib.md5(chunk.encode("utf-8")).hexdigest(), chunk)
+                    chunk_ids, texts = [], []
+                    for chunk_id, chunk_hash in record["chunks"]:
+                        if chunk_hash in by_hash:
+                            chunk_ids.append(chunk_id)
+                            texts.append(by_hash[chunk_hash])
+                    self.lexical.add_chunks(chunk_ids, texts, record["doc_id"])
+                    indexed += 1
+        return {"indexed": indexed, "missing": missing, **self.lexical.stats()}
 
     def retrieve(self, query_text: str, top_k: int = 5):
         return self.query(query_text, top_k=top_k)
 
-    def watch_folder(self, folder_path):
+    def watch_folder(self, folder_path, workers: int = 2, quiet_period: float = 1.0):
+        """Ingest what is already in the folder, then keep it in sync; returns the running FolderWatcher."""
+        from folder_watcher import FolderWatcher, IGNORED_FILES
+
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
@@ -218,7 +608,7 @@ class DocumentManager:
         for filename in os.listdir(folder_path):
             full_path = os.path.join(folder_path, filename)
             if not os.path.isfile(full_path): continue
-            if filename.lower() in ("desktop.ini", ".ds_store"): continue
+            if filename.lower() in IGNORED_FILES: continue
 
             result = self.ingest_file(full_path)
             if result.get("status") == "ingested":
@@ -232,7 +622,4 @@ class DocumentManager:
                 elif reason == "empty_file":
                     print(f"⚠️ Empty file: {filename}")
 
-        observer = Observer()
-        observer.schedule(WatcherHandler(self), folder_path, recursive=False)
-        observer.start()
-        return observer
+        return FolderWatcher(self, folder_path, workers=workers, quiet_period=quiet_period)
@@ -0,0 +1,102 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+class EmbeddingCache:
+    """Persistent, size-capped cache of embedding vectors keyed by (model name, hash of the text).
+
+    Vectors are stored as raw float32 bytes in a single SQLite file. When the stored vectors
+    exceed `max_bytes`, the least recently used entries are evicted down to 90% of the cap.
+    """
+    def __init__(self, path: str = "embedding_cache.sqlite", max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash BLOB NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.db.commit()
+        self._bytes = self.db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _hash(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, model_name: str, texts: list[str]) -> list:
+        """Return a float32 vector for every cached text and None for the rest."""
+        hashes = [self._hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for text_hash, vector in self.db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model_name, *batch]
+                ):
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+            if found:
+                now = time.time()
+                with self.db:
+                    self.db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model_name, h) for h in found]
+                    )
+            results = [found.get(h) for h in hashes]
+            hits = sum(v is not None for v in results)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model_name: str, texts: list[str], vectors) -> None:
+        now = time.time()
+        rows = [
+            (model_name, self._hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            with self.db:
+                # Overwritten entries are counted again, which only makes eviction slightly eager
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+            self._bytes += sum(len(row[2]) for row in rows)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        target = int(self.max_bytes * 0.9)
+        total = self.db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        victims = []
+        for model, text_hash, size in self.db.execute(
+            "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_used"
+        ):
+            if total <= target:
+                break
+            victims.append((model, text_hash))
+            total -= size
+        with self.db:
+            self.db.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+        self._bytes = total
+        print(f"🧹 Embedding cache: evicted {len(victims)} least recently used vectors")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
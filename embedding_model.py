@@ -1,27 +1,108 @@
 import os
+import threading
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+# Output dimensions of the supported models, so index names are known without loading the model
+MODEL_DIMENSIONS = {
+    "all-MiniLM-L6-v2": 384,
+    "all-mpnet-base-v2": 768,
+    "distilbert-base-nli-stsb-mean-tokens": 768,
+    "bert-base-nli-mean-tokens": 768,
+    "roberta-base-nli-mean-tokens": 768
+}
+
+
+def normalize_rows(matrix):
+    """L2-normalize the rows of a float32 matrix in place (zero rows stay zero); returns it."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms != 0)
+    return matrix
+
 
 class EmbeddingModel:
-    """Loads a SentenceTransformer embedding model for generating vector embeddings."""
-    def __init__(self, model_name: str):
+    """SentenceTransformer embedding model for generating vector embeddings.
+
+    The model (and torch) is loaded on first use, so commands that never embed don't pay for it.
+    Chunk embeddings go through an on-disk EmbeddingCache so unchanged text is never re-encoded;
+    pass cache_path=None to disable it. Embeddings come back as contiguous float32 matrices, one row
+    per text, L2-normalized when `normalize=True`.
+    """
+    def __init__(self, model_name: str, cache_path: str = "embedding_cache.sqlite", cache_max_bytes: int = 1 << 30):
+        self.model_name = model_name
+        self.cache = EmbeddingCache(cache_path, max_bytes=cache_max_bytes) if cache_path else None
+        self._model = None
+        self._dim = MODEL_DIMENSIONS.get(model_name.split("/")[-1])
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self.load()
+        return self._model
+
+    def load(self):
+        """Load the model now instead of on first use."""
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load()
+        return self._model
+
+    def _load(self):
         try:
             from sentence_transformers import SentenceTransformer
         except ImportError:
             raise ImportError("Please install the 'sentence_transformers' package to use embedding models.")
-        
-        self.model = SentenceTransformer(model_name)
 
+        model = SentenceTransformer(self.model_name)
         try:
-            self.dim = self.model.get_sentence_embedding_dimension()
+            dim = model.get_sentence_embedding_dimension()
         except AttributeError:
-            test_vec = self.model.encode("test", convert_to_numpy=True)
-            self.dim = len(test_vec)
-
-    def embed_text(self, text: str):
-        """Generate an embedding vector for a single piece of text."""
-        vec = self.model.encode(text, convert_to_numpy=True)
-        return vec.tolist()
-
-    def embed_texts(self, texts: list[str]):
-        """Generate embedding vectors for a list of text chunks (batch embedding)."""
-        vecs = self.model.encode(texts, convert_to_numpy=True)
-        return [vec.tolist() for vec in vecs]
+            dim = len(model.encode("test", convert_to_numpy=True))
+        if self._dim is not None and dim != self._dim:
+            raise RuntimeError(f"{self.model_name} produces {dim}-dimensional embeddings, expected {self._dim}")
+        self._dim = dim
+        return model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def dim(self) -> int:
+        if self._dim is None:
+            self.load()  # not a known model: its dimension is only known once loaded
+        return self._dim
+
+    def _encode(self, texts: list[str], normalize: bool = False):
+        matrix = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=normalize)
+        return np.ascontiguousarray(matrix, dtype=np.float32).reshape(len(texts), -1)
+
+    def embed_text(self, text: str, normalize: bool = False):
+        """Generate an embedding vector (1-D float32 array) for a single piece of text."""
+        return self._encode([text], normalize)[0]
+
+    def embed_queries(self, texts: list[str], normalize: bool = False):
+        """Encode a batch of queries in one forward pass; returns a float32 matrix (no disk cache)."""
+        return self._encode(list(texts), normalize)
+
+    def embed_texts(self, texts: list[str], normalize: bool = False):
+        """Embed a list of text chunks; returns a float32 matrix with one row per text."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if self.cache is None:
+            return self._encode(texts, normalize)
+
+        # Only run the transformer on texts the cache has not seen (each distinct text once).
+        # The cache holds raw vectors, so normalization happens once over the assembled matrix.
+        cached = self.cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        encoded = self._encode(missing) if missing else None
+        if missing:
+            self.cache.put_many(self.model_name, missing, encoded)
+        rows = dict(zip(missing, range(len(missing))))
+        matrix = np.empty((len(texts), encoded.shape[1] if missing else len(cached[0])), dtype=np.float32)
+        for i, (text, vec) in enumerate(zip(texts, cached)):
+            matrix[i] = encoded[rows[text]] if vec is None else vec
+        return normalize_rows(matrix) if normalize else matrix
@@ -1,50 +1,96 @@
 import os
+import time
+import hashlib
 
-def load_file(file_path: str) -> str:
-    """Load text content from a file (supports .txt, .pdf, .csv, .docx)."""
+STREAM_BLOCK_CHARS = 1 << 20  # text files are read this many characters at a time
+CSV_BLOCK_ROWS = 10000
+
+
+def iter_file_blocks(file_path: str, block_chars: int = STREAM_BLOCK_CHARS, csv_rows: int = CSV_BLOCK_ROWS):
+    """Yield the text of a file in blocks (PDF pages, CSV row blocks, fixed-size text reads).
+
+    Concatenating the blocks gives exactly the text load_file returns, so hashes match either way.
+    """
     file_path = os.path.abspath(file_path)
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
-    text_content = ""
-    if ext == ".txt":
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            text_content = f.read()
-    elif ext == ".pdf":
+    if ext == ".pdf":
         try:
             import fitz  # PyMuPDF
         except ImportError:
             raise ImportError("Please install 'pymupdf' to enable PDF support.")
-        doc = fitz.open(file_path)
-        text_pages = [page.get_text() for page in doc]
-        text_content = "\n".join(text_pages)
-        doc.close()
+        with fitz.open(file_path) as doc:
+            for i, page in enumerate(doc):
+                text = page.get_text()
+                yield text if i == 0 else "\n" + text
     elif ext == ".csv":
         # Try using pandas for CSV, otherwise read as plain text
         try:
             import pandas as pd
         except ImportError:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                text_content = f.read()
+            yield from _iter_text_blocks(file_path, block_chars)
         else:
-            df = pd.read_csv(file_path, dtype=str, header=None)
-            text_content = df.to_csv(index=False, header=False)
+            for df in pd.read_csv(file_path, dtype=str, header=None, chunksize=csv_rows):
+                yield df.to_csv(index=False, header=False)
     elif ext == ".docx":
+        # DOCX parsers only work on the whole document
+        yield _load_docx(file_path)
+    else:
+        # .txt, and a plain-text fallback for other extensions
+        yield from _iter_text_blocks(file_path, block_chars)
+
+
+def _iter_text_blocks(file_path: str, block_chars: int):
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                break
+            yield block
+
+
+def _load_docx(file_path: str) -> str:
+    try:
+        import docx2txt
+    except ImportError:
         try:
-            import docx2txt
+            from docx import Document
         except ImportError:
-            try:
-                from docx import Document
-            except ImportError:
-                raise ImportError("Please install 'python-docx' or 'docx2txt' to enable DOCX support.")
-            doc = Document(file_path)
-            full_text = [para.text for para in doc.paragraphs]
-            text_content = "\n".join(full_text)
-        else:
-            text_content = docx2txt.process(file_path)
-    else:
-        # Fallback: try reading as text for other extensions
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            text_content = f.read()
-    return text_content or ""
+            raise ImportError("Please install 'python-docx' or 'docx2txt' to enable DOCX support.")
+        doc = Document(file_path)
+        full_text = [para.text for para in doc.paragraphs]
+        return "\n".join(full_text)
+    return docx2txt.process(file_path)
+
+
+def load_file(file_path: str) -> str:
+    """Load text content from a file (supports .txt, .pdf, .csv, .docx)."""
+    return "".join(block for block in iter_file_blocks(file_path) if block)
+
+
+def hash_blocks(blocks) -> tuple[str, bool]:
+    """MD5 of streamed text (equal to the MD5 of the joined text), plus whether any of it is non-blank."""
+    md5, has_text = hashlib.md5(), False
+    for block in blocks:
+        md5.update(block.encode("utf-8"))
+        has_text = has_text or bool(block.strip())
+    return md5.hexdigest(), has_text
+
+
+def retry_locked(func, file_path: str, attempts: int = 5):
+    """Call func(file_path), retrying while another process still holds the file; None if it stays locked."""
+    for i in range(attempts):
+        try:
+            return func(file_path)
+        except PermissionError:
+            print(f"🔁 Retry {i+1}/{attempts}: File locked - {os.path.basename(file_path)}")
+            time.sleep(1)
+    print(f"❌ Could not load file after retries: {file_path}")
+    return None
+
+
+def load_file_with_retry(file_path: str, attempts: int = 5):
+    """load_file, retrying while another process still holds the file; None if it stays locked."""
+    return retry_locked(load_file, file_path, attempts)
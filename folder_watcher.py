@@ -0,0 +1,231 @@
+import os
+import time
+import queue
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+IGNORED_FILES = ("desktop.ini", ".ds_store")
+_STOP = object()
+
+
+class WatcherHandler(FileSystemEventHandler):
+    """Translates watchdog events into IngestQueue submissions; never does any work on the observer thread."""
+    def __init__(self, ingest_queue):
+        self.ingest_queue = ingest_queue
+
+    @staticmethod
+    def _ignored(path):
+        return os.path.basename(path).lower() in IGNORED_FILES
+
+    def on_created(self, event):
+        if not event.is_directory and not self._ignored(event.src_path):
+            self.ingest_queue.submit("upsert", event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory and not self._ignored(event.src_path):
+            self.ingest_queue.submit("upsert", event.src_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.ingest_queue.submit("delete", event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        if self._ignored(event.dest_path):
+            self.ingest_queue.submit("delete", event.src_path)
+        else:
+            self.ingest_queue.submit("move", event.dest_path, src_path=event.src_path)
+
+
+class IngestQueue:
+    """Coalesces file events per path and feeds them to a pool of ingest workers.
+
+    Every event for a path resets its quiet-period timer; the path is handed to a worker only once
+    no event has arrived for `quiet_period` seconds, so a copy that fires created + several modified
+    events is ingested once. A path is never processed by two workers at the same time.
+    """
+    def __init__(self, doc_manager, workers: int = 2, quiet_period: float = 1.0, lock_retries: int = 5):
+        self.doc_manager = doc_manager
+        self.quiet_period = quiet_period
+        self.lock_retries = lock_retries
+        self._pending = {}  # path -> {"action", "src", "reingest", "first_event", "last_event", "attempts"}
+        self._busy = set()
+        self._ready = queue.Queue()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.processed = 0
+        self.failed = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._wait_total = 0.0
+
+        self._threads = [threading.Thread(target=self._schedule, daemon=True)]
+        self._threads += [threading.Thread(target=self._work, daemon=True) for _ in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, action: str, path: str, src_path: str = None):
+        """Record an "upsert", "delete" or "move" (path is the destination) event."""
+        path = os.path.abspath(path)
+        now = time.monotonic()
+        with self._cond:
+            entry = self._pending.get(path)
+            if action == "move":
+                src_path = os.path.abspath(src_path)
+                moved = self._pending.pop(src_path, None)
+                entry = {"action": "move", "src": src_path, "reingest": False, "first_event": now, "attempts": 0}
+                if moved is not None:
+                    entry["first_event"] = moved["first_event"]
+                    if moved["action"] == "move":
+                        # A chain of renames collapses into one move from the original path
+                        entry["src"], entry["reingest"] = moved["src"], moved["reingest"]
+                    elif moved["action"] == "upsert":
+                        entry["reingest"] = True
+            elif action == "upsert" and entry is not None and entry["action"] == "move":
+                # Written after being moved in: move the indexed copy, then pick up the changes
+                entry["reingest"] = True
+            elif action == "delete" and entry is not None and entry["action"] == "move":
+                # Moved in and deleted again before settling: only the original path's entry is left
+                del self._pending[path]
+                path, entry = entry["src"], {"action": "delete", "first_event": entry["first_event"], "attempts": 0}
+            else:
+                first_event = entry["first_event"] if entry else now
+                entry = {"action": action, "first_event": first_event, "attempts": 0}
+            entry["last_event"] = now
+            self._pending[path] = entry
+            self._cond.notify_all()
+
+    def _schedule(self):
+        """Move settled paths (quiet for `quiet_period`, not being processed) onto the work queue."""
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                next_due = None
+                for path, entry in list(self._pending.items()):
+                    due = entry["last_event"] + self.quiet_period
+                    if due > now or path in self._busy or entry.get("src") in self._busy:
+                        if due > now:
+                            next_due = due if next_due is None else min(next_due, due)
+                        continue
+                    del self._pending[path]
+                    self._busy.update(p for p in (path, entry.get("src")) if p)
+                    entry["ready_at"] = now
+                    self._ready.put((path, entry))
+                self._cond.wait(None if next_due is None else next_due - now)
+
+    def _work(self):
+        while True:
+            item = self._ready.get()
+            if item is _STOP:
+                break
+            path, entry = item
+            started = time.monotonic()
+            try:
+                outcome = self._process(path, entry)
+            except Exception as e:
+                print(f"❌ Failed to process {os.path.basename(path)}: {e}")
+                outcome = "failed"
+            with self._cond:
+                self._busy.difference_update(p for p in (path, entry.get("src")) if p)
+                if outcome != "retry":
+                    lag = time.monotonic() - entry["first_event"]
+                    self.processed += 1
+                    self.failed += outcome == "failed"
+                    self._lag_total += lag
+                    self._lag_max = max(self._lag_max, lag)
+                    self._wait_total += started - entry["ready_at"]
+                elif path not in self._pending:
+                    # File still locked: try again after another quiet period
+                    entry["last_event"] = time.monotonic()
+                    self._pending[path] = entry
+                self._cond.notify_all()
+
+    def _process(self, path, entry):
+        """Apply one settled entry; returns "done", "failed", or "retry" if the file is still locked."""
+        dm, name = self.doc_manager, os.path.basename(path)
+        if entry["action"] == "delete":
+            if dm.delete_document(path).get("status") == "deleted":
+                print(f"🗑️ File deleted: {name}")
+            return "done"
+
+        if entry["action"] == "move":
+            result = dm.move_document(entry["src"], path)
+            if result.get("status") == "moved":
+                print(f"🚚 File moved: {os.path.basename(entry['src'])} → {name}")
+                if not entry["reingest"]:
+                    return "done"
+            # A move from an unindexed path is just a new file here
+
+        if not os.path.isfile(path):
+            return "done"
+        try:
+            with open(path, "rb"):
+                pass
+        except (PermissionError, OSError):
+            entry["attempts"] += 1
+            if entry["attempts"] < self.lock_retries:
+                print(f"🔒 File still locked ({entry['attempts']}/{self.lock_retries}): {name}")
+                return "retry"
+            print(f"❌ Skipping file - still locked: {name}")
+            return "failed"
+
+        result = dm.ingest_file(path)
+        if result.get("status") == "ingested":
+            print(f"✅ Ingested: {name} (lag {time.monotonic() - entry['first_event']:.1f}s, queue {self.depth})")
+        elif result.get("reason") == "duplicate_content":
+            print(f"⚠️ Duplicate: {name}")
+        elif result.get("status") == "error":
+            print(f"❌ Failed to ingest {name}: {result.get('reason')}")
+            return "failed"
+        return "done"
+
+    @property
+    def depth(self) -> int:
+        """Paths waiting to settle plus paths waiting for a worker."""
+        return len(self._pending) + self._ready.qsize()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "debouncing": len(self._pending),
+                "queued": self._ready.qsize(),
+                "in_progress": len(self._busy),
+                "processed": self.processed,
+                "failed": self.failed,
+                "avg_lag_s": self._lag_total / self.processed if self.processed else 0.0,
+                "max_lag_s": self._lag_max,
+                "avg_queue_wait_s": self._wait_total / self.processed if self.processed else 0.0,
+            }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for _ in self._threads[1:]:
+            self._ready.put(_STOP)
+
+    def join(self, timeout: float = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class FolderWatcher:
+    """A watchdog observer plus the IngestQueue it feeds; stop()/join() shut both down."""
+    def __init__(self, doc_manager, folder_path: str, workers: int = 2, quiet_period: float = 1.0):
+        self.queue = IngestQueue(doc_manager, workers=workers, quiet_period=quiet_period)
+        self.observer = Observer()
+        self.observer.schedule(WatcherHandler(self.queue), folder_path, recursive=False)
+        self.observer.start()
+
+    def stats(self) -> dict:
+        return self.queue.stats()
+
+    def stop(self):
+        self.observer.stop()
+        self.queue.stop()
+
+    def join(self, timeout: float = None):
+        self.observer.join(timeout)
+        self.queue.join(timeout)
@@ -0,0 +1,228 @@
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class APIError(Exception):
+    """Request failed for good (non-retryable status, retries exhausted, or deadline passed)."""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(APIError):
+    """Rejected without calling the endpoint because it has been failing."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and rejects calls for `reset_timeout` seconds.
+
+    After that a single trial call is let through (half-open); its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self.opened_at, self._trial_running = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """End a trial call without a verdict on the endpoint (e.g. the caller was interrupted)."""
+        with self._lock:
+            self._trial_running = False
+
+
+class ResilientClient:
+    """Shared HTTP client: pooled keep-alive connections, per-request deadlines, jittered exponential
+    backoff on 429/5xx and connection errors, a circuit breaker and a cap on in-flight requests.
+    """
+    def __init__(self, max_concurrency: int = 4, pool_size: int = 10, connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0, deadline: float = 120.0, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 10.0, breaker: CircuitBreaker = None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self._metrics_lock = threading.Lock()
+        self.counts = {"requests": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected": 0}
+        self.status_counts = {}
+        self._latencies = deque(maxlen=1000)  # seconds, successful requests only
+
+    # ---------- public API ----------
+
+    def post_json(self, url: str, payload: dict, headers: dict = None, deadline: float = None):
+        """POST and return the decoded JSON body."""
+        with self._request(url, payload, headers, deadline, stream=False) as response:
+            return response.json()
+
+    def post_stream(self, url: str, payload: dict, headers: dict = None, deadline: float = None):
+        """POST and yield decoded response lines as they arrive.
+
+        Retries only happen before the first line is yielded; a connection lost after that raises
+        APIError rather than ending the stream early. The concurrency slot is held until the stream is
+        exhausted or closed.
+        """
+        with self._request(url, payload, headers, deadline, stream=True) as response:
+            try:
+                yield from response.iter_lines(decode_unicode=True)
+            except requests.RequestException as e:
+                raise APIError(f"Stream interrupted: {e}") from e
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self.counts)
+            stats["status_counts"] = dict(self.status_counts)
+        stats["circuit"] = self.breaker.state
+        stats["latency_p50_ms"] = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+        stats["latency_p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+        lookups = stats["succeeded"] + stats["failed"]
+        stats["error_rate"] = stats["failed"] / lookups if lookups else 0.0
+        return stats
+
+    # ---------- internals ----------
+
+    def _count(self, key, status=None, latency=None):
+        with self._metrics_lock:
+            self.counts[key] += 1
+            if status is not None:
+                self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def _request(self, url, payload, headers, deadline, stream):
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        self._count("requests")
+        if not self._slots.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+            self._count("failed")
+            raise APIError("Timed out waiting for a free request slot")
+        try:
+            response = self._send_with_retries(url, payload, headers, deadline_at, stream)
+        except BaseException:
+            self._slots.release()
+            raise
+        return _SlotResponse(response, self._slots)
+
+    def _send_with_retries(self, url, payload, headers, deadline_at, stream):
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._count("failed")
+                raise APIError("Request deadline exceeded")
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpenError("Circuit open: endpoint is failing, not sending request")
+
+            timeout = (min(self.timeout[0], remaining), min(self.timeout[1], remaining))
+            started = time.monotonic()
+            retry_after, error = None, None
+            settled = False  # whether the breaker got this attempt's outcome; a half-open trial must always end
+            try:
+                try:
+                    response = self.session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                    error = APIError(f"Request failed: {e}")
+                except requests.RequestException as e:
+                    # Not worth retrying (e.g. an invalid URL), but it is still a failed call
+                    self.breaker.record_failure()
+                    settled = True
+                    self._count("failed")
+                    raise APIError(f"Request failed: {e}") from e
+                else:
+                    if response.status_code == 200:
+                        self.breaker.record_success()
+                        settled = True
+                        self._count("succeeded", status=200, latency=time.monotonic() - started)
+                        return response
+                    self._count_status(response.status_code)
+                    try:
+                        error = APIError(f"API error {response.status_code}: {response.text}", response.status_code)
+                        retry_after = response.headers.get("Retry-After")
+                    finally:
+                        response.close()
+                    if response.status_code not in RETRY_STATUSES:
+                        # The endpoint answered; a bad request says nothing about its health
+                        self.breaker.record_success()
+                        settled = True
+                        self._count("failed")
+                        raise error
+                self.breaker.record_failure()
+                settled = True
+            finally:
+                if not settled:
+                    self.breaker.release()
+
+            if attempt >= self.max_retries:
+                self._count("failed")
+                raise error
+            # Full jitter, but never sooner than the server asked for and never past the deadline
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            if time.monotonic() + delay >= deadline_at:
+                self._count("failed")
+                raise error
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    def _count_status(self, status):
+        with self._metrics_lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+
+class _SlotResponse:
+    """Context manager that closes the response and gives the concurrency slot back."""
+    def __init__(self, response, slots):
+        self.response, self._slots = response, slots
+
+    def __enter__(self):
+        return self.response
+
+    def __exit__(self, *exc):
+        try:
+            self.response.close()
+        finally:
+            self._slots.release()
@@ -0,0 +1,192 @@
+import os
+import time
+import queue
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from file_utils import load_file_with_retry
+from chunker import get_chunker
+
+IGNORED_FILES = ("desktop.ini", ".ds_store")
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+def _load_and_chunk(file_path: str, known_hash: str, chunker_spec: tuple) -> dict:
+    """Process-pool stage: parse and chunk one file. Unchanged files stop before chunking."""
+    try:
+        content = load_file_with_retry(file_path)
+    except Exception as e:
+        return {"file_path": file_path, "status": "error", "reason": str(e)}
+    if content is None:
+        return {"file_path": file_path, "status": "error", "reason": "permission_denied"}
+    if not content.strip():
+        return {"file_path": file_path, "status": "skipped", "reason": "empty_file"}
+
+    file_hash = hashlib.md5(content.encode("utf-8")).hexdigest()
+    if file_hash == known_hash:
+        return {"file_path": file_path, "status": "skipped", "reason": "no_change"}
+    return {"file_path": file_path, "file_hash": file_hash, "chunks": get_chunker(*chunker_spec).chunk(content)}
+
+
+class BulkIngester:
+    """Pipelined bulk ingestion of a folder into a DocumentManager.
+
+    Stages: a process pool parses and chunks files; one embedding thread batches chunks across
+    files into large encode calls; one writer thread commits each file with a bulk insert.
+    Bounded queues between the stages provide backpressure, and the index and metadata are
+    persisted once at the end instead of after every file. Planning and committing a file hold
+    the DocumentManager lock, as in ingest_file, so other writers (e.g. the watcher) can run alongside.
+    """
+    def __init__(self, doc_manager, workers: int = None, embed_batch_size: int = 256, queue_size: int = 32):
+        self.doc_manager = doc_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+
+    @staticmethod
+    def list_files(folder_path: str) -> list[str]:
+        files = []
+        for root, _, names in os.walk(folder_path):
+            for name in sorted(names):
+                if name.lower() not in IGNORED_FILES:
+                    files.append(os.path.abspath(os.path.join(root, name)))
+        return files
+
+    def ingest_dir(self, folder_path: str) -> dict:
+        files = self.list_files(folder_path)
+        # Large files skip the process pool and are streamed window by window afterwards
+        large = {f for f in files if os.path.getsize(f) > self.doc_manager.stream_threshold}
+        small = [f for f in files if f not in large]
+        results = {}
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        embedder = threading.Thread(target=self._embed_stage, args=(embed_queue, write_queue), daemon=True)
+        writer = threading.Thread(target=self._write_stage, args=(write_queue, results), daemon=True)
+
+        start = time.perf_counter()
+        # Spawned workers, created before the stage threads: forking a process that runs threads (and may
+        # hold a loaded model) can copy a lock in its held state into the child
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        with pool, self.doc_manager.deferred_writes():
+            embedder.start()
+            writer.start()
+            try:
+                self._parse_stage(pool, small, embed_queue, results)
+            finally:
+                embed_queue.put(_DONE)
+                embedder.join()
+                writer.join()
+            for path in sorted(large):
+                try:
+                    results[path] = self.doc_manager.ingest_file_streaming(path)
+                except Exception as e:
+                    print(f"❌ Failed to ingest {os.path.basename(path)}: {e}")
+                    results[path] = {"status": "error", "reason": str(e)}
+        elapsed = time.perf_counter() - start
+
+        statuses = [r.get("status") for r in results.values()]
+        chunks = sum(r.get("added", 0) for r in results.values())
+        return {
+            "files": len(files),
+            "ingested": statuses.count("ingested"),
+            "skipped": statuses.count("skipped"),
+            "errors": statuses.count("error"),
+            "chunks": chunks,
+            "seconds": elapsed,
+            "files_per_sec": len(files) / elapsed if elapsed else 0.0,
+            "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+            "results": results
+        }
+
+    def _parse_stage(self, pool, files, embed_queue, results):
+        dm = self.doc_manager
+        planned_hashes = {}  # content hash -> doc id for files planned in this run but not yet committed
+        pending = iter(files)
+        in_flight = set()
+
+        def submit_next():
+            for path in pending:
+                in_flight.add(pool.submit(_load_and_chunk, path, dm.metadata.hash_for_path(path), dm.chunker.spec))
+                return
+
+        # Keep only a few files per worker in flight so parsed text cannot pile up in memory
+        for _ in range(self.workers * 2):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                submit_next()
+                try:
+                    item = future.result()
+                except Exception as e:
+                    print(f"❌ Worker failed: {e}")
+                    continue
+                path = item["file_path"]
+                if "status" in item:
+                    results[path] = item
+                    continue
+
+                with dm._lock:
+                    skipped = dm._precheck(path, item["file_hash"])
+                    if not skipped and path not in dm.metadata and item["file_hash"] in planned_hashes:
+                        skipped = {"status": "skipped", "reason": "duplicate_content",
+                                   "duplicate_of": planned_hashes[item["file_hash"]]}
+                    if not skipped:
+                        plan = dm._plan_ingest(path, item["file_hash"], item["chunks"])
+                if skipped:
+                    results[path] = skipped
+                    continue
+                planned_hashes[item["file_hash"]] = plan["doc_id"]
+                embed_queue.put(plan)  # blocks while the embedder is behind; never with the lock held
+
+    def _embed_stage(self, embed_queue, write_queue):
+        finished = False
+        while not finished:
+            plan = embed_queue.get()
+            if plan is _DONE:
+                break
+            # Drain whatever else is already waiting so one encode call covers several files
+            batch, count = [plan], len(plan["new_texts"])
+            while count < self.embed_batch_size:
+                try:
+                    plan = embed_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if plan is _DONE:
+                    finished = True
+                    break
+                batch.append(plan)
+                count += len(plan["new_texts"])
+
+            texts = [text for plan in batch for text in plan["new_texts"]]
+            try:
+                embeddings = self.doc_manager.embed_chunks(texts)
+            except Exception as e:
+                for plan in batch:
+                    write_queue.put((plan, e))
+                continue
+            offset = 0
+            for plan in batch:
+                n = len(plan["new_texts"])
+                write_queue.put((plan, embeddings[offset:offset + n]))
+                offset += n
+        write_queue.put(_DONE)
+
+    def _write_stage(self, write_queue, results):
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                break
+            plan, embeddings = item
+            path = plan["file_path"]
+            if isinstance(embeddings, Exception):
+                results[path] = {"status": "error", "reason": str(embeddings)}
+                continue
+            try:
+                with self.doc_manager._lock:
+                    results[path] = self.doc_manager._commit_ingest(plan, embeddings)
+            except Exception as e:
+                print(f"❌ Failed to write {os.path.basename(path)}: {e}")
+                results[path] = {"status": "error", "reason": str(e)}
@@ -0,0 +1,277 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import numpy as np
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its of on or our she "
+    "so than that the their them then there these they this to was we were what when which who will with "
+    "you your".split()
+)
+# Words plus compounds such as error codes, versions and dotted names ("err-1042", "v2.1", "os.path")
+_TOKEN = re.compile(r"\w+(?:[-./:]\w+)*")
+_SPLIT = re.compile(r"[-./:]")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased terms of `text`; a compound is indexed whole and as its parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) > 64:
+            continue
+        if token not in STOPWORDS:
+            terms.append(token)
+        if _SPLIT.search(token):
+            terms.extend(part for part in _SPLIT.split(token) if part and part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """Persistent BM25 inverted index over chunk text, in a SQLite sidecar next to the vector store.
+
+    Each term's postings are append-only segments of packed arrays (uint32 chunk rows, uint16 term
+    frequencies). A new segment absorbs the newest existing ones while they are not much larger, so a
+    term keeps O(log n) segments and a write only touches the terms of the chunks it adds. Deleted
+    chunks are dropped from postings lazily, whenever a segment holding them is merged.
+    """
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._pending = None  # term -> (rows, tfs) buffered inside batch()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # AUTOINCREMENT: rows are never reused, so stale postings of deleted chunks can't match new ones
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY AUTOINCREMENT, chunk_id NOT NULL UNIQUE, doc_id NOT NULL, length INTEGER)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "seg INTEGER PRIMARY KEY AUTOINCREMENT, term TEXT NOT NULL, n INTEGER, rows BLOB, tfs BLOB)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS postings_term ON postings (term, seg)")
+        self._load_lengths()
+
+    # ---------- in-memory chunk lengths ----------
+
+    def _load_lengths(self):
+        """Chunk lengths indexed by row (0 = deleted), used for scoring and to skip stale postings."""
+        max_row = self.db.execute("SELECT MAX(row) FROM chunks").fetchone()[0] or 0
+        self._lengths = np.zeros(max_row + 1, dtype=np.uint32)
+        for row, length in self.db.execute("SELECT row, length FROM chunks"):
+            self._lengths[row] = length
+        self._live = int(np.count_nonzero(self._lengths))
+        self._total_length = int(self._lengths.sum())
+        self._version = self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        # Another process (e.g. the folder watcher) changed the index: reload the lengths
+        if self.db.execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._load_lengths()
+
+    def _set_length(self, row, length):
+        if row >= len(self._lengths):
+            grown = np.zeros(max(row + 1, 2 * len(self._lengths)), dtype=np.uint32)
+            grown[:len(self._lengths)] = self._lengths
+            self._lengths = grown
+        old = int(self._lengths[row])
+        self._lengths[row] = length
+        self._live += (length > 0) - (old > 0)
+        self._total_length += length - old
+
+    def _alive(self, rows):
+        inside = rows < len(self._lengths)
+        return inside & (self._lengths[np.where(inside, rows, 0)] > 0)
+
+    # ---------- transactions ----------
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            if self._batch_depth:
+                yield
+                return
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                self._load_lengths()
+                raise
+            self.db.execute("COMMIT")
+
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction and buffer postings, writing one segment per term on exit."""
+        with self._lock:
+            self._batch_depth += 1
+            if self._batch_depth == 1:
+                self.db.execute("BEGIN IMMEDIATE")
+                self._pending = {}
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    pending, self._pending = self._pending, None
+                    self._flush(pending)
+                    self.db.execute("COMMIT")
+
+    # ---------- writes ----------
+
+    def add_chunks(self, chunk_ids: list, texts: list[str], doc_id):
+        with self._write():
+            self._delete_rows("chunk_id", list(chunk_ids))  # a re-added id gets a fresh row
+            postings = self._pending if self._pending is not None else {}
+            for chunk_id, text in zip(chunk_ids, texts):
+                counts = Counter(tokenize(text))
+                length = max(1, sum(counts.values()))
+                row = self.db.execute(
+                    "INSERT INTO chunks (chunk_id, doc_id, length) VALUES (?, ?, ?)", (chunk_id, doc_id, length)
+                ).lastrowid
+                self._set_length(row, length)
+                for term, tf in counts.items():
+                    rows, tfs = postings.setdefault(term, ([], []))
+                    rows.append(row)
+                    tfs.append(min(tf, 65535))
+            if self._pending is None:
+                self._flush(postings)
+
+    def delete_chunks(self, chunk_ids: list):
+        with self._write():
+            self._delete_rows("chunk_id", list(chunk_ids))
+
+    def delete_document(self, doc_id):
+        with self._write():
+            self._delete_rows("doc_id", [doc_id])
+
+    def clear(self):
+        with self._write():
+            self.db.execute("DELETE FROM chunks")
+            self.db.execute("DELETE FROM postings")
+            if self._pending is not None:
+                self._pending.clear()
+            self._lengths[:] = 0
+            self._live, self._total_length = 0, 0
+
+    def _delete_rows(self, column, values):
+        for start in range(0, len(values), 900):  # stay under SQLite's bound-parameter limit
+            part = values[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            rows = [r[0] for r in self.db.execute(f"SELECT row FROM chunks WHERE {column} IN ({placeholders})", part)]
+            if not rows:
+                continue
+            self.db.execute(f"DELETE FROM chunks WHERE {column} IN ({placeholders})", part)
+            for row in rows:
+                self._set_length(row, 0)
+
+    def _flush(self, postings):
+        for term, (rows, tfs) in postings.items():
+            self._append_segment(term, np.asarray(rows, dtype=np.uint32), np.asarray(tfs, dtype=np.uint16))
+
+    def _append_segment(self, term, rows, tfs):
+        # Absorb the newest segments while each is at most twice the size gathered so far
+        merged, size = [], len(rows)
+        for seg, n in self.db.execute("SELECT seg, n FROM postings WHERE term = ? ORDER BY seg DESC", (term,)):
+            if n > 2 * size:
+                break
+            merged.append(seg)
+            size += n
+        if merged:
+            placeholders = ",".join("?" * len(merged))
+            old = self.db.execute(
+                f"SELECT rows, tfs FROM postings WHERE seg IN ({placeholders}) ORDER BY seg", merged
+            ).fetchall()
+            rows = np.concatenate([np.frombuffer(r, dtype=np.uint32) for r, _ in old] + [rows])
+            tfs = np.concatenate([np.frombuffer(t, dtype=np.uint16) for _, t in old] + [tfs])
+            alive = self._alive(rows)
+            rows, tfs = rows[alive], tfs[alive]
+            self.db.execute(f"DELETE FROM postings WHERE seg IN ({placeholders})", merged)
+        if len(rows):
+            self.db.execute(
+                "INSERT INTO postings (term, n, rows, tfs) VALUES (?, ?, ?, ?)",
+                (term, len(rows), rows.tobytes(), tfs.tobytes())
+            )
+
+    # ---------- search ----------
+
+    def search(self, query_text: str, top_k: int = 5) -> list[dict]:
+        """Top chunks by BM25 score: [{"id", "doc_id", "score"}], best first."""
+        terms = list(dict.fromkeys(tokenize(query_text)))
+        if not terms:
+            return []
+        with self._lock:
+            self._refresh()
+            if not self._live:
+                return []
+            found = {term: ([], []) for term in terms}
+            placeholders = ",".join("?" * len(terms))
+            for term, rows, tfs in self.db.execute(
+                f"SELECT term, rows, tfs FROM postings WHERE term IN ({placeholders})", terms
+            ):
+                found[term][0].append(np.frombuffer(rows, dtype=np.uint32))
+                found[term][1].append(np.frombuffer(tfs, dtype=np.uint16))
+            for term in terms if self._pending else ():
+                if term in self._pending:
+                    rows, tfs = self._pending[term]
+                    found[term][0].append(np.asarray(rows, dtype=np.uint32))
+                    found[term][1].append(np.asarray(tfs, dtype=np.uint16))
+
+            n_docs, avgdl = self._live, self._total_length / self._live
+            hit_rows, hit_scores = [], []
+            for rows_parts, tfs_parts in found.values():
+                if not rows_parts:
+                    continue
+                rows, tfs = np.concatenate(rows_parts), np.concatenate(tfs_parts).astype(np.float32)
+                alive = self._alive(rows)
+                rows, tfs = rows[alive], tfs[alive]
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / avgdl)
+                hit_rows.append(rows)
+                hit_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            if not hit_rows:
+                return []
+
+            rows, inverse = np.unique(np.concatenate(hit_rows), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(len(scores))
+            best = best[np.argsort(-scores[best], kind="stable")]
+            top_rows = [int(row) for row in rows[best]]
+            placeholders = ",".join("?" * len(top_rows))
+            ids = {row: (chunk_id, doc_id) for row, chunk_id, doc_id in self.db.execute(
+                f"SELECT row, chunk_id, doc_id FROM chunks WHERE row IN ({placeholders})", top_rows
+            )}
+        return [
+            {"id": ids[row][0], "doc_id": ids[row][1], "score": float(score)}
+            for row, score in zip(top_rows, scores[best]) if row in ids
+        ]
+
+    # ---------- info ----------
+
+    def __len__(self) -> int:
+        return self._live
+
+    def stats(self) -> dict:
+        with self._lock:
+            terms, segments, size = self.db.execute(
+                "SELECT COUNT(DISTINCT term), COUNT(*), COALESCE(SUM(LENGTH(rows) + LENGTH(tfs)), 0) FROM postings"
+            ).fetchone()
+            return {"chunks": self._live, "terms": terms, "segments": segments, "posting_bytes": size}
+
+    def close(self):
+        with self._lock:
+            self.db.close()
@@ -1,11 +1,15 @@
 import os
-import requests
+import json
+import time
 from dotenv import load_dotenv
+from http_client import ResilientClient
+import metrics
 
 load_dotenv()  # ✅ Must be called before getenv
 
 HF_API_TOKEN = os.getenv("HF_TOKEN")
-API_URL = "https://api-inference.huggingface.co/models/HuggingFaceH4/zephyr-7b-beta"
+# LLM_API_URL points the client at another endpoint, e.g. mock_llm_server.py for local testing
+API_URL = os.getenv("LLM_API_URL", "https://api-inference.huggingface.co/models/HuggingFaceH4/zephyr-7b-beta")
 
 
 
@@ -13,6 +17,14 @@ headers = {
     "Authorization": f"Bearer {HF_API_TOKEN}"
 }
 
+# One pooled client per process: keep-alive connections, deadlines, retries and an in-flight cap
+client = ResilientClient(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+    deadline=float(os.getenv("LLM_DEADLINE", "120")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4"))
+)
+
 def generate_from_api(prompt: str, max_tokens=256):
     payload = {
         "inputs": prompt,
@@ -22,9 +34,34 @@ def generate_from_api(prompt: str, max_tokens=256):
         }
     }
 
-    response = requests.post(API_URL, headers=headers, json=payload)
+    with metrics.span("llm.generate"):
+        return client.post_json(API_URL, payload, headers=headers)[0]['generated_text']
+
 
-    if response.status_code != 200:
-        raise Exception(f"API error {response.status_code}: {response.text}")
+def stream_from_api(prompt: str, max_tokens=256):
+    """Yield generated text token by token as the API streams it (server-sent events)."""
+    payload = {
+        "inputs": prompt,
+        "parameters": {
+            "max_new_tokens": max_tokens,
+            "return_full_text": False
+        },
+        "stream": True
+    }
 
-    return response.json()[0]['generated_text']
+    started, tokens = time.perf_counter(), 0
+    with metrics.span("llm.stream"):
+        for line in client.post_stream(API_URL, payload, headers=headers):
+            # Events look like `data: {"token": {"text": ..., "special": ...}, "generated_text": ...}`
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):])
+            if "error" in event:
+                raise Exception(f"API error: {event['error']}")
+            token = event.get("token") or {}
+            if token.get("text") and not token.get("special"):
+                if not tokens:
+                    metrics.record("llm.first_token", time.perf_counter() - started)
+                tokens += 1
+                yield token["text"]
+    metrics.count("llm_tokens_streamed", tokens)
@@ -4,15 +4,21 @@ Universal Vector DB Pipeline: multi-vector DB & multi-embedding support
 
 Usage (CLI):
     poetry run python main.py --db faiss --model all-MiniLM-L6-v2 ingest Files/example.pdf
+    poetry run python main.py --db faiss --model all-MiniLM-L6-v2 ingest-dir Files/ --workers 4
     poetry run python main.py --db chroma --model all-mpnet-base-v2 list
+    poetry run python main.py --db faiss --model all-MiniLM-L6-v2 query-batch questions.txt --top_k 10 > hits.jsonl
     poetry run python main.py --db pinecone --model roberta-base-nli-mean-tokens watch Files/
+    poetry run python main.py --db faiss --model all-MiniLM-L6-v2 --index_type hnsw recall
+    poetry run python main.py --db faiss --model all-MiniLM-L6-v2 --precision sq8 recall
+    poetry run python main.py --db faiss --model all-MiniLM-L6-v2 --metrics_json stages.json ingest-dir Files/
 
 Fallback (Interactive):
     python main.py          ← Prompts you to select DB and model, then runs folder watcher
 """
 
-import sys, argparse, os
+import sys, argparse, os, json, time, contextlib, atexit
 from document_manager import DocumentManager
+import metrics
 
 
 def parse_arguments():
@@ -22,31 +28,87 @@ def parse_arguments():
         "all-MiniLM-L6-v2", "all-mpnet-base-v2", "distilbert-base-nli-stsb-mean-tokens",
         "bert-base-nli-mean-tokens", "roberta-base-nli-mean-tokens"
     ], required=False)
+    parser.add_argument("--batch_size", type=int, help="Vectors per bulk write to the vector DB")
+    # FAISS index layout and search knobs (ignored by other backends)
+    parser.add_argument("--index_type", choices=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+                        help="FAISS index type; an existing index is converted when this differs")
+    parser.add_argument("--nlist", type=int, help="FAISS IVF: number of inverted lists")
+    parser.add_argument("--nprobe", type=int, help="FAISS IVF: lists probed per query")
+    parser.add_argument("--ef_search", type=int, help="FAISS HNSW: efSearch per query")
+    parser.add_argument("--precision", choices=["fp32", "fp16", "sq8", "pq"],
+                        help="FAISS vector storage precision; an existing index is re-encoded when this differs")
+    # Per-stage timings and counters (see metrics.py)
+    parser.add_argument("--metrics_port", type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--metrics_json", help="Write stage timings and counters to this JSON file on exit")
     subparsers = parser.add_subparsers(dest="command", help="Operation to perform")
 
     # ingest <file_path>
     ingest_parser = subparsers.add_parser("ingest")
     ingest_parser.add_argument("file")
 
+    # ingest-dir <folder_path>: parallel bulk ingest of every file under a folder
+    ingest_dir_parser = subparsers.add_parser("ingest-dir")
+    ingest_dir_parser.add_argument("folder")
+    ingest_dir_parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+
     # query <text>
     query_parser = subparsers.add_parser("query")
     query_parser.add_argument("query", nargs="+")
     query_parser.add_argument("--top_k", type=int, default=5)
+    query_parser.add_argument("--hybrid", action="store_true", help="Fuse vector and BM25 keyword results")
+
+    # query-batch [file]: many questions (one per line, or JSONL with "id" and "query"), JSONL hits on stdout
+    query_batch_parser = subparsers.add_parser("query-batch")
+    query_batch_parser.add_argument("input", nargs="?", default="-", help="Questions file (default: stdin)")
+    query_batch_parser.add_argument("--top_k", type=int, default=5)
+    query_batch_parser.add_argument("--batch-size", type=int, default=64, help="Questions embedded and searched together")
+    query_batch_parser.add_argument("--hybrid", action="store_true", help="Fuse vector and BM25 keyword results")
 
     # list
     subparsers.add_parser("list")
 
+    # reindex-lexical: rebuild the BM25 keyword index from the indexed files
+    subparsers.add_parser("reindex-lexical")
+
     # delete <file_path>
     delete_parser = subparsers.add_parser("delete")
     delete_parser.add_argument("file")
 
+    # recall (FAISS only): recall-vs-latency of the stored index, or of --index_type/--precision built
+    # in memory from the stored vectors, against an exact scan
+    recall_parser = subparsers.add_parser("recall")
+    recall_parser.add_argument("--queries", type=int, default=200)
+    recall_parser.add_argument("--top_k", type=int, default=10)
+
     # watch <folder_path>
     watch_parser = subparsers.add_parser("watch")
     watch_parser.add_argument("folder")
+    watch_parser.add_argument("--workers", type=int, default=2, help="Ingest worker threads")
+    watch_parser.add_argument("--debounce", type=float, default=1.0,
+                              help="Seconds a file must be quiet before it is ingested")
 
     return parser.parse_args()
 
 
+def read_query_batches(lines, batch_size):
+    """Yield lists of (id, question) from plain lines (id = line number) or JSONL {"id", "query"} lines."""
+    batch = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        query_id, text = line_no, line
+        if line.startswith("{"):
+            record = json.loads(line)
+            query_id, text = record.get("id", line_no), record.get("query") or record.get("question", "")
+        batch.append((query_id, text))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def main():
     args = parse_arguments()
 
@@ -79,7 +141,6 @@ def main():
             observer = doc_manager.watch_folder(folder_path)
             print(f"\n✅ Watching folder: {folder_path}")
             print("📂 Drop files here to auto-ingest. Press Ctrl+C to stop.")
-            import time
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
@@ -91,8 +152,30 @@ def main():
         return
 
     # ✅ CLI MODE
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    if args.metrics_json:
+        metrics.enable()
+        atexit.register(metrics.write_json, args.metrics_json)
+    db_options = {"batch_size": args.batch_size} if args.batch_size else {}
+    if args.db == "faiss":
+        faiss_options = {
+            "index_type": args.index_type, "nlist": args.nlist, "nprobe": args.nprobe, "ef_search": args.ef_search,
+            "precision": args.precision
+        }
+        db_options.update({k: v for k, v in faiss_options.items() if v is not None})
+        # Queries never write, so serve them from a lazily memory-mapped index
+        if args.command in ("query", "query-batch", "list"):
+            db_options["read_only"] = True
+        # recall measures a requested layout on an in-memory copy instead of converting the stored index
+        if args.command == "recall":
+            db_options.pop("index_type", None)
+            db_options.pop("precision", None)
     try:
-        doc_manager = DocumentManager(db_type=args.db, model_name=args.model)
+        doc_manager = DocumentManager(db_type=args.db, model_name=args.model, db_options=db_options)
+        # Listing reads only the metadata store; everything else needs the vector DB, so fail fast here
+        if args.command != "list":
+            doc_manager.open_vector_db()
     except Exception as e:
         print(f"Initialization error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -101,6 +184,8 @@ def main():
         result = doc_manager.ingest_file(args.file)
         if result.get("status") == "ingested":
             print(f"✅ Ingested: {os.path.basename(args.file)} (ID: {result.get('id')})")
+            if result.get("reused") or result.get("removed"):
+                print(f"♻️ Chunks: {result['reused']} reused, {result['added']} added, {result['removed']} removed")
         elif result.get("status") == "skipped":
             reason = result.get("reason")
             if reason == "no_change":
@@ -111,10 +196,28 @@ def main():
                 print(f"⚠️ Empty file: Skipped {os.path.basename(args.file)}")
         else:
             print(f"❌ Failed to ingest {os.path.basename(args.file)}", file=sys.stderr)
+        cache = doc_manager.embedding_model.cache
+        if cache is not None and cache.hits + cache.misses:
+            stats = cache.stats()
+            print(f"🧠 Embedding cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+    elif args.command == "ingest-dir":
+        from ingest_pipeline import BulkIngester
+        summary = BulkIngester(doc_manager, workers=args.workers).ingest_dir(args.folder)
+        for path, result in summary["results"].items():
+            if result.get("status") == "error":
+                print(f"❌ Failed to ingest {os.path.basename(path)}: {result.get('reason')}", file=sys.stderr)
+        print(f"✅ {summary['ingested']} ingested, {summary['skipped']} skipped, {summary['errors']} failed "
+              f"out of {summary['files']} files")
+        print(f"⏱️ {summary['seconds']:.2f}s: {summary['files_per_sec']:.1f} files/sec, "
+              f"{summary['chunks_per_sec']:.1f} chunks/sec ({summary['chunks']} chunks)")
 
     elif args.command == "query":
         query_text = " ".join(args.query)
-        results = doc_manager.query(query_text, top_k=args.top_k)
+        if args.hybrid:
+            results = doc_manager.hybrid_query(query_text, top_k=args.top_k)
+        else:
+            results = doc_manager.query(query_text, top_k=args.top_k)
         if not results:
             print("❌ No similar documents found.")
         else:
@@ -124,6 +227,40 @@ def main():
                 score = res['score']
                 print(f"{i}. {os.path.basename(file_path)}  (score: {score:.3f})")
 
+    elif args.command == "query-batch":
+        source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+        out = sys.stdout
+        started, queries, hits = time.perf_counter(), 0, 0
+        # Keep stdout pure JSONL: status prints from the backends and the summary go to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                for batch in read_query_batches(source, args.batch_size):
+                    texts = [text for _, text in batch]
+                    if args.hybrid:
+                        # One batched vector search fills the caches the per-question fusion reads from
+                        doc_manager.query_batch(texts, top_k=max(4 * args.top_k, 20))
+                        results = [doc_manager.hybrid_query(text, top_k=args.top_k) for text in texts]
+                    else:
+                        results = doc_manager.query_batch(texts, top_k=args.top_k)
+                    for (query_id, _), query_results in zip(batch, results):
+                        for rank, res in enumerate(query_results, 1):
+                            out.write(json.dumps({
+                                "id": query_id,
+                                "rank": rank,
+                                "file": res["file_path"],
+                                "chunk_index": res.get("metadata", {}).get("chunk_index"),
+                                "score": res["score"]
+                            }) + "\n")
+                        hits += len(query_results)
+                    out.flush()
+                    queries += len(batch)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+        seconds = time.perf_counter() - started
+        print(f"⏱️ {queries} queries, {hits} hits in {seconds:.2f}s "
+              f"({queries / seconds if seconds else 0.0:.1f} queries/sec)", file=sys.stderr)
+
     elif args.command == "list":
         docs = doc_manager.list_documents()
         if not docs:
@@ -132,6 +269,20 @@ def main():
             print("📄 Indexed files:")
             for path in docs:
                 print(f"- {path}")
+            estimate = doc_manager.memory_estimate()
+            if estimate:
+                print(f"💾 {estimate['vectors']} vectors x {estimate['dimension']} dims ({estimate['layout']}): "
+                      f"~{estimate['bytes'] / 2**20:.1f} MiB in memory")
+                if estimate["by_precision"]:
+                    print("   " + ", ".join(f"{precision} ~{size / 2**20:.1f} MiB"
+                                           for precision, size in estimate["by_precision"].items()))
+
+    elif args.command == "reindex-lexical":
+        summary = doc_manager.rebuild_lexical_index()
+        print(f"🔤 Keyword index rebuilt: {summary['indexed']} files, {summary['chunks']} chunks, "
+              f"{summary['terms']} terms ({summary['posting_bytes'] / 1024:.0f} KiB of postings)")
+        if summary["missing"]:
+            print(f"⚠️ {summary['missing']} indexed files could not be read; re-ingest them to index their keywords")
 
     elif args.command == "delete":
         result = doc_manager.delete_document(args.file)
@@ -140,18 +291,48 @@ def main():
         else:
             print(f"⚠️ File not found in index: {os.path.basename(args.file)}")
 
+    elif args.command == "recall":
+        if args.db != "faiss":
+            print("⚠️ The recall report is only available for --db faiss", file=sys.stderr)
+            sys.exit(1)
+        try:
+            report = doc_manager.vector_db.recall_report(num_queries=args.queries, top_k=args.top_k,
+                                                         index_type=args.index_type, precision=args.precision)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        if not report["rows"]:
+            print("📭 No vectors indexed.")
+        else:
+            kind = "candidate (in memory, not saved)" if report["candidate"] else "stored"
+            print(f"📊 {kind} {report['index_type']}/{report['precision']} index, {report['vectors']} vectors, "
+                  f"{report['queries']} queries, recall@{report['top_k']} vs exact flat scan "
+                  f"({report['exact_latency_ms']:.3f} ms/query):")
+            for row in report["rows"]:
+                label = row["param"] if row["value"] is None else f"{row['param']}={row['value']}"
+                print(f"- {label:<16} recall {row['recall']:.3f}  latency {row['latency_ms']:.3f} ms/query")
+            report = doc_manager.vector_db.precision_report(num_queries=args.queries, top_k=args.top_k)
+            print(f"🗜️ Storage precision (now {report['precision']}), flat scan recall@{report['top_k']} "
+                  f"vs exact fp32 over the stored vectors:")
+            for row in report["rows"]:
+                print(f"- {row['precision']:<16} recall {row['recall']:.3f} ({row['recall_delta']:+.3f})  "
+                      f"latency {row['latency_ms']:.3f} ms/query  ~{row['bytes'] / 2**20:.1f} MiB")
+
     elif args.command == "watch":
         try:
-            observer = doc_manager.watch_folder(args.folder)
+            observer = doc_manager.watch_folder(args.folder, workers=args.workers, quiet_period=args.debounce)
             print(f"👀 Watching: {args.folder}")
             print("📂 Drop files to auto-ingest. Press Ctrl+C to stop.")
-            import time
             while True:
                 time.sleep(1)
         except KeyboardInterrupt:
             print("\n🛑 Stopping watcher...")
             observer.stop()
             observer.join()
+            stats = observer.stats()
+            print(f"📊 {stats['processed']} events processed ({stats['failed']} failed), "
+                  f"avg lag {stats['avg_lag_s']:.1f}s, max lag {stats['max_lag_s']:.1f}s, "
+                  f"avg queue wait {stats['avg_queue_wait_s']:.2f}s")
 
 
 if __name__ == "__main__":
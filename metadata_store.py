@@ -0,0 +1,145 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class MetadataStore:
+    """Document bookkeeping (path, doc id, content hash, chunk list) in a SQLite database in WAL mode.
+
+    Every write touches only the rows of one document and commits on its own, so a crash never
+    leaves a torn file and other processes can keep reading while an ingest is running. Inside
+    `batch()` writes are grouped into a single transaction instead.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # doc_id has no declared type so FAISS ids stay integers and path ids stay text
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "path TEXT PRIMARY KEY, doc_id NOT NULL, file_hash TEXT, chunks TEXT)"
+        )
+        self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS documents_doc_id ON documents (doc_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS documents_file_hash ON documents (file_hash)")
+
+    @contextmanager
+    def _write(self):
+        with self._lock:
+            if self._batch_depth:
+                yield
+                return
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    @contextmanager
+    def batch(self):
+        """Group all writes made inside the block (from any thread) into one transaction.
+
+        The transaction is committed on exit even if the block fails, so the bookkeeping stays in
+        step with whatever already reached the vector store.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            if self._batch_depth == 1:
+                self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.db.execute("COMMIT")
+
+    def _one(self, sql, params):
+        with self._lock:
+            return self.db.execute(sql, params).fetchone()
+
+    # ---------- lookups ----------
+
+    def get(self, path: str):
+        """{"doc_id", "file_hash", "chunks"} for an indexed path, or None. chunks is None for legacy entries."""
+        row = self._one("SELECT doc_id, file_hash, chunks FROM documents WHERE path = ?", (path,))
+        if row is None:
+            return None
+        return {"doc_id": row[0], "file_hash": row[1], "chunks": json.loads(row[2]) if row[2] is not None else None}
+
+    def __contains__(self, path: str) -> bool:
+        return self._one("SELECT 1 FROM documents WHERE path = ?", (path,)) is not None
+
+    def path_for_id(self, doc_id):
+        row = self._one("SELECT path FROM documents WHERE doc_id = ?", (doc_id,))
+        return row[0] if row else None
+
+    def id_for_hash(self, file_hash: str):
+        row = self._one("SELECT doc_id FROM documents WHERE file_hash = ? LIMIT 1", (file_hash,))
+        return row[0] if row else None
+
+    def hash_for_path(self, path: str):
+        row = self._one("SELECT file_hash FROM documents WHERE path = ?", (path,))
+        return row[0] if row else None
+
+    def max_int_id(self) -> int:
+        row = self._one("SELECT MAX(doc_id) FROM documents WHERE typeof(doc_id) = 'integer'", ())
+        return row[0] or 0
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another process) commits to the store."""
+        return self._one("PRAGMA data_version", ())[0]
+
+    def paths(self) -> list[str]:
+        with self._lock:
+            return [row[0] for row in self.db.execute("SELECT path FROM documents ORDER BY path")]
+
+    def __len__(self) -> int:
+        return self._one("SELECT COUNT(*) FROM documents", ())[0]
+
+    def chunk_count(self) -> int:
+        """Chunks recorded over all documents (legacy entries without a chunk list count as none)."""
+        return self._one("SELECT COALESCE(SUM(json_array_length(chunks)), 0) FROM documents", ())[0]
+
+    # ---------- writes ----------
+
+    def put(self, path: str, doc_id, file_hash: str, chunks: list = None):
+        with self._write():
+            self.db.execute(
+                "INSERT OR REPLACE INTO documents (path, doc_id, file_hash, chunks) VALUES (?, ?, ?, ?)",
+                (path, doc_id, file_hash, json.dumps(chunks) if chunks is not None else None)
+            )
+
+    def delete(self, path: str):
+        with self._write():
+            self.db.execute("DELETE FROM documents WHERE path = ?", (path,))
+
+    def move(self, src_path: str, dest_path: str):
+        with self._write():
+            self.db.execute("DELETE FROM documents WHERE path = ?", (dest_path,))
+            self.db.execute("UPDATE documents SET path = ? WHERE path = ?", (dest_path, src_path))
+
+    def import_json(self, json_path: str) -> int:
+        """One-off migration from the old whole-file <index>_meta.json; the file is renamed afterwards."""
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        path_to_hash, path_to_chunks = data.get("path_to_hash", {}), data.get("path_to_chunks", {})
+        with self._write():
+            for path, doc_id in data.get("path_to_id", {}).items():
+                chunks = path_to_chunks.get(path)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO documents (path, doc_id, file_hash, chunks) VALUES (?, ?, ?, ?)",
+                    (path, doc_id, path_to_hash.get(path), json.dumps(chunks) if chunks is not None else None)
+                )
+        os.replace(json_path, json_path + ".migrated")
+        return len(data.get("path_to_id", {}))
+
+    def close(self):
+        with self._lock:
+            self.db.close()
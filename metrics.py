@@ -0,0 +1,278 @@
+"""Timing spans and counters for the RAG pipeline stages, exportable as Prometheus text or JSON.
+
+Recording is off unless RAG_METRICS=1 (or metrics.enable()); disabled, a span costs one flag check.
+Durations go to per-stage histograms; inside `with metrics.trace():` the spans of that request
+are also kept in order for a latency breakdown, and appended to RAG_TRACE_LOG (JSON lines) if set.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv("RAG_METRICS", "").lower() in ("1", "true", "yes", "on")
+TRACE_LOG = os.getenv("RAG_TRACE_LOG")
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+class Registry:
+    """Per-stage duration histograms and counters, keyed by name plus sorted labels."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}  # (stage, labels) -> [count, sum, per-bucket counts]
+        self._counters = {}  # (name, labels) -> value
+
+    def observe(self, stage: str, seconds: float, labels: tuple = ()):
+        key = (stage, labels)
+        with self._lock:
+            entry = self._durations.get(key)
+            if entry is None:
+                entry = self._durations[key] = [0, 0.0, [0] * len(BUCKETS)]
+            entry[0] += 1
+            entry[1] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry[2][i] += 1
+                    break
+
+    def inc(self, name: str, value: float = 1, labels: tuple = ()):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = [
+                {"stage": stage, **dict(labels), "count": count, "sum_s": total, "mean_ms": total / count * 1000}
+                for (stage, labels), (count, total, _) in sorted(self._durations.items())
+            ]
+            counters = [{"name": name, **dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+        return {"stages": stages, "counters": counters}
+
+    def prometheus(self) -> str:
+        def fmt(labels):
+            return ",".join(f'{key}="{value}"' for key, value in labels)
+
+        lines = ["# TYPE rag_stage_duration_seconds histogram"]
+        with self._lock:
+            for (stage, labels), (count, total, buckets) in sorted(self._durations.items()):
+                base = fmt((("stage", stage),) + labels)
+                cumulative = 0
+                for bound, n in zip(BUCKETS, buckets):
+                    cumulative += n
+                    lines.append(f'rag_stage_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'rag_stage_duration_seconds_bucket{{{base},le="+Inf"}} {count}')
+                lines.append(f"rag_stage_duration_seconds_sum{{{base}}} {total}")
+                lines.append(f"rag_stage_duration_seconds_count{{{base}}} {count}")
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                lines.append(f"# TYPE rag_{name}_total counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"rag_{name}_total{{{fmt(labels)}}} {value}" if labels
+                                     else f"rag_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Trace:
+    """The spans of one request, for a per-request latency breakdown."""
+    def __init__(self, name: str = "request"):
+        self.name = name
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = []  # {"stage", "start_ms", "ms", "depth"}, in order of completion
+        self._depth = 0
+
+    def _enter(self):
+        self._depth += 1
+        return self._depth - 1
+
+    def _exit(self, stage, start, seconds, depth):
+        self._depth = depth
+        self.spans.append({"stage": stage, "start_ms": (start - self.started) * 1000, "ms": seconds * 1000,
+                           "depth": depth})
+
+    def breakdown(self) -> list[dict]:
+        """Spans in start order; nested stages follow their parent with a larger depth."""
+        return sorted(self.spans, key=lambda span: (span["start_ms"], span["depth"]))
+
+    def to_dict(self) -> dict:
+        total = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        return {"name": self.name, "total_ms": total * 1000, "spans": self.breakdown()}
+
+
+class _TraceGroup:
+    """Records into several traces at once (a micro-batch serving several requests)."""
+    def __init__(self, traces):
+        self.traces = traces
+
+    def _enter(self):
+        return [trace._enter() for trace in self.traces]
+
+    def _exit(self, stage, start, seconds, depths):
+        for trace, depth in zip(self.traces, depths):
+            trace._exit(stage, start, seconds, depth)
+
+
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str = "request"):
+    """Collect the spans of one request; yields the Trace."""
+    request_trace = Trace(name)
+    token = _current.set(request_trace)
+    try:
+        yield request_trace
+    finally:
+        _current.reset(token)
+        request_trace.seconds = time.perf_counter() - request_trace.started
+        if ENABLED and TRACE_LOG:
+            with open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"time": time.time(), **request_trace.to_dict()}) + "\n")
+
+
+@contextmanager
+def attach(traces):
+    """Record spans into the given requests' traces, e.g. in a worker thread serving them."""
+    traces = [t for t in traces if t is not None]
+    token = _current.set(_TraceGroup(traces) if traces else None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "start", "trace", "depth")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.trace = _current.get()
+        self.depth = self.trace._enter() if self.trace is not None else 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        REGISTRY.observe(self.stage, seconds, self.labels)
+        if self.trace is not None:
+            self.trace._exit(self.stage, self.start, seconds, self.depth)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str, **labels):
+    """Context manager timing one stage."""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(stage, tuple(sorted(labels.items())))
+
+
+def timed(stage: str, **labels):
+    """Decorator form of span()."""
+    labels = tuple(sorted(labels.items()))
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Span(stage, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(stage: str, seconds: float, request_trace=None, **labels):
+    """Record a duration measured elsewhere (e.g. time to first token, queueing delay)."""
+    if not ENABLED:
+        return
+    REGISTRY.observe(stage, seconds, tuple(sorted(labels.items())))
+    request_trace = request_trace or _current.get()
+    if request_trace is not None:
+        start = time.perf_counter() - seconds
+        request_trace._exit(stage, start, seconds, request_trace._enter())
+
+
+def count(name: str, value: float = 1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, value, tuple(sorted(labels.items())))
+
+
+def snapshot() -> dict:
+    return REGISTRY.snapshot()
+
+
+def prometheus_text() -> str:
+    return REGISTRY.prometheus()
+
+
+def write_json(path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 9464, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a background thread; enables recording."""
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics at http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Hugging Face text-generation endpoint used by llm_api.
+
+Answers both plain requests (JSON list with generated_text) and streaming requests ("stream": true,
+server-sent events, one token per event), with a configurable delay per token so time-to-first-token
+and total latency can be observed without network access or an API token. Faults can be injected
+(fail the first N requests with a status such as 503, hang before answering, or drop a stream after
+N tokens) to exercise the client's retries, deadlines and circuit breaker. tests/ starts it in-process.
+
+Usage:
+    python mock_llm_server.py --port 8089 --token-delay 0.05
+    python mock_llm_server.py --fail-first 3 --fail-status 503
+    python mock_llm_server.py --disconnect-after 5
+    LLM_API_URL=http://127.0.0.1:8089 streamlit run app.py
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def mock_answer(prompt: str, max_tokens: int) -> list[str]:
+    """Deterministic fake answer built from the question in the prompt, as a list of tokens."""
+    question = prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip() or "your question"
+    words = f"This is a mock answer to: {question}".split()
+    return [word if i == 0 else " " + word for i, word in enumerate(words)][:max_tokens]
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    token_delay = 0.05
+    fail_first = 0  # answer this many requests with fail_status before behaving
+    fail_status = 503
+    hang = 0.0  # seconds to stall before every response
+    disconnect_after = None  # close streams after this many tokens, without the terminating chunk
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.stats_lock:
+            self.server.requests += 1
+            failing = self.server.requests <= self.fail_first
+        if self.hang:
+            time.sleep(self.hang)
+        if failing:
+            self._send_json(self.fail_status, {"error": "injected failure"}, {"Retry-After": "0"})
+            return
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        max_tokens = payload.get("parameters", {}).get("max_new_tokens", 256)
+        tokens = mock_answer(payload.get("inputs", ""), max_tokens)
+
+        if not payload.get("stream"):
+            time.sleep(self.token_delay * len(tokens))
+            self._send_json(200, [{"generated_text": "".join(tokens)}])
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, text in enumerate(tokens):
+            if i == self.disconnect_after:
+                self.close_connection = True
+                return
+            time.sleep(self.token_delay)
+            last = i == len(tokens) - 1
+            event = {
+                "token": {"id": i, "text": text, "logprob": 0.0, "special": False},
+                "generated_text": "".join(tokens) if last else None,
+                "details": None
+            }
+            self._send_chunk(f"data:{json.dumps(event)}\n\n".encode("utf-8"))
+        self._send_chunk(b"")
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, obj, extra_headers: dict = None):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep test output quiet
+
+
+class MockServer(ThreadingHTTPServer):
+    """Counts TCP connections and requests, so connection reuse can be checked."""
+    daemon_threads = True
+
+    def __init__(self, address, handler):
+        super().__init__(address, handler)
+        self.stats_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    def handle_error(self, request, client_address):
+        pass  # clients that gave up on a hung request leave broken pipes behind
+
+
+def serve_in_thread(port: int = 0, token_delay: float = 0.05, fail_first: int = 0, fail_status: int = 503,
+                    hang: float = 0.0, disconnect_after: int = None) -> MockServer:
+    """Start the mock server on a background thread; the URL is http://127.0.0.1:<server.server_port>."""
+    handler = type("Handler", (MockLLMHandler,), {
+        "token_delay": token_delay, "fail_first": fail_first, "fail_status": fail_status, "hang": hang,
+        "disconnect_after": disconnect_after
+    })
+    server = MockServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock LLM text-generation server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--token-delay", type=float, default=0.05, help="Seconds between streamed tokens")
+    parser.add_argument("--fail-first", type=int, default=0, help="Fail this many requests before answering")
+    parser.add_argument("--fail-status", type=int, default=503, help="Status code for injected failures")
+    parser.add_argument("--hang", type=float, default=0.0, help="Seconds to stall before every response")
+    parser.add_argument("--disconnect-after", type=int, help="Drop every stream after this many tokens")
+    args = parser.parse_args()
+
+    MockLLMHandler.token_delay = args.token_delay
+    MockLLMHandler.fail_first, MockLLMHandler.fail_status, MockLLMHandler.hang = args.fail_first, args.fail_status, args.hang
+    MockLLMHandler.disconnect_after = args.disconnect_after
+    server = MockServer(("127.0.0.1", args.port), MockLLMHandler)
+    print(f"🧪 Mock LLM server on http://127.0.0.1:{args.port} ({args.token_delay}s per token)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping mock server.")
@@ -0,0 +1,102 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import metrics
+
+_STOP = object()
+
+
+class QueryBatcher:
+    """Collects queries arriving at about the same time and answers them with one batched call.
+
+    The first query of a batch waits at most `max_wait` seconds for company; a batch is cut as soon
+    as it holds `max_batch` queries. `run_batch(texts, top_k)` must return one result list per text.
+    Callers from any thread or event loop can submit; batches run one at a time on a single thread.
+    Spans of a batch are recorded into the metrics trace of every request it serves.
+    """
+    def __init__(self, run_batch, max_wait: float = 0.005, max_batch: int = 32):
+        self.run_batch = run_batch
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, query_text: str, top_k: int = 5) -> Future:
+        future = Future()
+        self._queue.put((query_text, top_k, future, metrics.current_trace(), time.perf_counter()))
+        return future
+
+    def query(self, query_text: str, top_k: int = 5):
+        """Blocking variant for threaded callers (e.g. concurrent Streamlit sessions)."""
+        return self.submit(query_text, top_k).result()
+
+    async def aquery(self, query_text: str, top_k: int = 5):
+        return await asyncio.wrap_future(self.submit(query_text, top_k))
+
+    def _collect(self):
+        """Block for one request, then gather more until the window closes or the batch is full."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, stop on the next round
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            with self._stats_lock:
+                self.batches += 1
+                self.queries += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            # Requests with different top_k are searched separately; usually there is only one group
+            by_top_k = {}
+            for item in batch:
+                by_top_k.setdefault(item[1], []).append(item)
+            for top_k, items in by_top_k.items():
+                started = time.perf_counter()
+                for _, _, _, request_trace, submitted in items:
+                    metrics.record("query.queue", started - submitted, request_trace)
+                try:
+                    with metrics.attach([item[3] for item in items]):
+                        results = self.run_batch([item[0] for item in items], top_k)
+                except Exception as e:
+                    for item in items:
+                        item[2].set_exception(e)
+                    continue
+                for item, result in zip(items, results):
+                    item[2].set_result(result)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "pending": self._queue.qsize(),
+            }
+
+    def stop(self):
+        self._queue.put(_STOP)
+        self._thread.join()
@@ -1,7 +1,8 @@
-import argparse
+import os, time, argparse
 from document_manager import DocumentManager
-from rag_utils import build_prompt
-from llm_api import generate_from_api  # Or `load_mistral_model()` if using local
+from rag_prompt import build_rag_prompt, load_prompt_tokenizer, MAX_CONTEXT_TOKENS
+from llm_api import generate_from_api, API_URL  # Or `load_mistral_model()` if using local
+from answer_cache import SemanticAnswerCache
 
 def main():
     parser = argparse.ArgumentParser(description="RAG Pipeline")
@@ -9,6 +10,8 @@ def main():
     parser.add_argument("--model", required=True, help="Embedding model used for retrieval.")
     parser.add_argument("--question", required=True, help="User query/question.")
     parser.add_argument("--top_k", type=int, default=3, help="Number of top documents to retrieve.")
+    parser.add_argument("--max_context_tokens", type=int, default=MAX_CONTEXT_TOKENS,
+                        help="Token budget for the retrieved context in the prompt.")
 
     args = parser.parse_args()
 
@@ -22,20 +25,22 @@ def main():
         print("⚠️ No matching documents found.")
         return
 
-    # Extract context text
-    chunks = []
-    for result in results:
-        file_path = result["file_path"]
-        score = result["score"]
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            chunks.append(f.read())
-
-    # Format prompt
-    prompt = build_prompt(args.question, chunks)
-
-    # Generate answer from LLM
-    answer = generate_from_api(prompt)  # Or call local model
-    print(f"\n🤖 Answer:\n{answer}")
+    # Format prompt: the retrieved chunks, packed into the context token budget
+    tokenizer = load_prompt_tokenizer() or doc_manager.chunker.tokenizer
+    prompt = build_rag_prompt(args.question, results, max_tokens=args.max_context_tokens, tokenizer=tokenizer)
+
+    # Generate answer from LLM, unless a near-identical question was answered from the same chunks
+    cache = SemanticAnswerCache(doc_manager.embed_query,
+                                path=os.getenv("RAG_ANSWER_CACHE", "answer_cache.sqlite") or None,
+                                namespace=f"{args.db}|{args.model}|{API_URL}")
+    answer = cache.get(args.question, results)
+    if answer is None:
+        started = time.perf_counter()
+        answer = generate_from_api(prompt)  # Or call local model
+        cache.put(args.question, results, answer, latency=time.perf_counter() - started)
+        print(f"\n🤖 Answer:\n{answer}")
+    else:
+        print(f"\n🤖 Answer (cached):\n{answer}")
 
 if __name__ == "__main__":
     main()
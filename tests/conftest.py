@@ -0,0 +1,26 @@
+"""Shared fixtures: a local MockServer standing in for the LLM endpoint."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm_server import serve_in_thread  # noqa: E402
+
+
+@pytest.fixture
+def mock_server():
+    """Start a MockServer with the given faults; returns (server, url). Servers are stopped afterwards."""
+    servers = []
+
+    def start(**options):
+        options.setdefault("token_delay", 0.0)
+        server = serve_in_thread(**options)
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
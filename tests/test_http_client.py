@@ -0,0 +1,172 @@
+"""ResilientClient and llm_api against MockServer: retries, circuit breaker, deadlines, pooling and metrics."""
+import time
+
+import pytest
+
+import llm_api
+import metrics
+from http_client import APIError, CircuitBreaker, CircuitOpenError, ResilientClient
+
+PAYLOAD = {"inputs": "Question: what is a mock? Answer:", "parameters": {"max_new_tokens": 8}}
+
+
+class MaxBackoff:
+    """Stands in for `random` in http_client: always the full backoff, and remembers each one."""
+    def __init__(self):
+        self.delays = []
+
+    def uniform(self, low, high):
+        self.delays.append(high)
+        return high
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    stub = MaxBackoff()
+    monkeypatch.setattr("http_client.random", stub)
+    return stub
+
+
+def answer(client, url):
+    return client.post_json(url, PAYLOAD)[0]["generated_text"]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_status_is_retried_with_backoff(mock_server, backoff, status):
+    server, url = mock_server(fail_first=3, fail_status=status)
+    client = ResilientClient(max_retries=4, backoff_base=0.01)
+
+    assert answer(client, url).startswith("This is a mock answer")
+    assert server.requests == 4
+    assert backoff.delays == [0.01, 0.02, 0.04]  # exponential, one per retry
+    stats = client.stats()
+    assert stats["retries"] == 3
+    assert stats["status_counts"] == {status: 3, 200: 1}
+    assert (stats["requests"], stats["succeeded"], stats["failed"]) == (1, 1, 0)
+
+
+def test_retries_stop_at_the_limit(mock_server, backoff):
+    server, url = mock_server(fail_first=100, fail_status=503)
+    client = ResilientClient(max_retries=2, backoff_base=0.01, breaker=CircuitBreaker(failure_threshold=100))
+
+    with pytest.raises(APIError) as excinfo:
+        answer(client, url)
+    assert excinfo.value.status_code == 503
+    assert server.requests == 3
+    assert len(backoff.delays) == 2
+    stats = client.stats()
+    assert (stats["retries"], stats["failed"], stats["succeeded"]) == (2, 1, 0)
+    assert stats["error_rate"] == 1.0
+
+
+def test_non_retryable_status_fails_at_once(mock_server):
+    server, url = mock_server(fail_first=1, fail_status=400)
+    client = ResilientClient(max_retries=4, backoff_base=0.01)
+
+    with pytest.raises(APIError) as excinfo:
+        answer(client, url)
+    assert excinfo.value.status_code == 400
+    assert server.requests == 1
+    # A bad request says nothing about the endpoint's health
+    assert client.breaker.state == "closed"
+
+
+def test_circuit_opens_then_settles_its_half_open_trial(mock_server):
+    server, url = mock_server(fail_first=3, fail_status=503)
+    client = ResilientClient(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.2))
+
+    for _ in range(2):
+        with pytest.raises(APIError):
+            answer(client, url)
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        answer(client, url)
+    assert server.requests == 2  # rejected without calling the endpoint
+    assert client.stats()["rejected"] == 1
+
+    # The half-open trial fails (third injected failure): the circuit re-opens instead of staying half-open
+    time.sleep(0.25)
+    assert client.breaker.state == "half_open"
+    with pytest.raises(APIError):
+        answer(client, url)
+    assert client.breaker.state == "open"
+
+    # The next trial succeeds and closes the circuit
+    time.sleep(0.25)
+    assert answer(client, url).startswith("This is a mock answer")
+    assert client.breaker.state == "closed"
+    assert server.requests == 4
+
+
+def test_trial_ended_by_a_non_retryable_error_is_settled(mock_server):
+    server, url = mock_server(fail_first=1, fail_status=503)
+    client = ResilientClient(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.2))
+    with pytest.raises(APIError):
+        answer(client, url)
+
+    time.sleep(0.25)
+    with pytest.raises(APIError):
+        client.post_json("http://", PAYLOAD)  # invalid URL: fails before reaching any server
+    assert client.breaker.state == "open"
+
+    # Not stuck with a trial that never finished: after the timeout another trial goes through
+    time.sleep(0.25)
+    assert answer(client, url).startswith("This is a mock answer")
+    assert client.breaker.state == "closed"
+
+
+def test_hung_endpoint_is_cut_off_by_the_deadline(mock_server):
+    server, url = mock_server(hang=3)
+    client = ResilientClient(read_timeout=30, deadline=0.5, backoff_base=0.01)
+
+    started = time.monotonic()
+    with pytest.raises(APIError):
+        answer(client, url)
+    assert time.monotonic() - started < 1.5
+
+    started = time.monotonic()
+    with pytest.raises(APIError):
+        list(client.post_stream(url, dict(PAYLOAD, stream=True)))
+    assert time.monotonic() - started < 1.5
+    assert client.stats()["failed"] == 2
+
+
+def test_connections_are_reused_and_counted(mock_server):
+    server, url = mock_server(fail_first=2, fail_status=503)
+    client = ResilientClient(max_retries=4, backoff_base=0.01)
+
+    for _ in range(3):
+        answer(client, url)
+    lines = [line for line in client.post_stream(url, dict(PAYLOAD, stream=True)) if line]
+    assert len(lines) == len(answer(client, url).split())
+
+    # Failed responses are read and their connection returned to the pool, so one connection serves all
+    assert server.connections == 1
+    assert server.requests == 7
+    stats = client.stats()
+    assert (stats["requests"], stats["succeeded"], stats["failed"], stats["retries"]) == (5, 5, 0, 2)
+    assert stats["status_counts"] == {503: 2, 200: 5}
+    assert stats["error_rate"] == 0.0
+    assert stats["latency_p50_ms"] > 0
+
+
+def test_llm_api_records_latency_and_token_metrics(mock_server, monkeypatch):
+    server, url = mock_server()
+    monkeypatch.setattr(llm_api, "API_URL", url)
+    monkeypatch.setattr(llm_api, "client", ResilientClient(backoff_base=0.01))
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.REGISTRY.reset()
+    try:
+        text = llm_api.generate_from_api(PAYLOAD["inputs"], max_tokens=8)
+        tokens = list(llm_api.stream_from_api(PAYLOAD["inputs"], max_tokens=8))
+        snapshot = metrics.snapshot()
+    finally:
+        metrics.REGISTRY.reset()
+
+    assert "".join(tokens) == text
+    stages = {stage["stage"]: stage["count"] for stage in snapshot["stages"]}
+    assert stages["llm.generate"] == 1
+    assert stages["llm.stream"] == 1
+    assert stages["llm.first_token"] == 1
+    counters = {counter["name"]: counter["value"] for counter in snapshot["counters"]}
+    assert counters["llm_tokens_streamed"] == len(tokens)
@@ -0,0 +1,84 @@
+"""Streamed answers from MockServer through llm_api.stream_from_api and LLMInterface.ask_stream."""
+import time
+
+import numpy as np
+import pytest
+
+import llm_api
+from answer_cache import SemanticAnswerCache
+from chat.interface import LLMInterface
+from http_client import APIError, ResilientClient
+from mock_llm_server import mock_answer
+
+QUESTION = "How does Kafka help in real-time data processing?"
+SOURCES = [{"id": 7, "metadata": {"file": "kafka.txt", "chunk_hash": "abc"}}]
+
+
+@pytest.fixture
+def endpoint(mock_server, monkeypatch):
+    """Point llm_api at a fresh MockServer and client; returns the server."""
+    def start(**options):
+        server, url = mock_server(**options)
+        monkeypatch.setattr(llm_api, "API_URL", url)
+        monkeypatch.setattr(llm_api, "client", ResilientClient(backoff_base=0.01, deadline=10))
+        return server
+    return start
+
+
+def expected_tokens(question=QUESTION):
+    return mock_answer(LLMInterface._prompt(question, "context"), 256)
+
+
+def test_tokens_arrive_one_at_a_time_in_order(endpoint):
+    delay = 0.05
+    endpoint(token_delay=delay)
+    tokens, arrivals = [], []
+    for token in llm_api.stream_from_api(LLMInterface._prompt(QUESTION, "context")):
+        tokens.append(token)
+        arrivals.append(time.perf_counter())
+
+    assert tokens == expected_tokens()
+    # Each token is delivered as the server sends it, not buffered until the answer is complete
+    gaps = np.diff(arrivals)
+    assert len(gaps) == len(tokens) - 1
+    assert np.all(gaps > delay / 2)
+
+
+def test_ask_stream_rebuilds_answer_for_history_and_cache(endpoint):
+    server = endpoint()
+    cache = SemanticAnswerCache(lambda question: np.ones(4))
+    llm = LLMInterface(answer_cache=cache)
+
+    streamed = list(llm.ask_stream(QUESTION, context="context", sources=SOURCES))
+    answer = "".join(expected_tokens())
+    assert streamed == expected_tokens()
+    assert not llm.last_cached
+    assert llm.history[-1] == {"question": QUESTION, "response": answer}
+    assert cache.get(QUESTION, SOURCES) == answer
+
+    # The same question over the same chunks is answered from the cache without calling the server
+    requests_before = server.requests
+    assert list(llm.ask_stream(QUESTION, context="context", sources=SOURCES)) == [answer]
+    assert llm.last_cached
+    assert server.requests == requests_before
+    assert llm.history[-1]["response"] == answer
+
+
+def test_disconnect_mid_stream_raises(endpoint):
+    endpoint(disconnect_after=3)
+    received = []
+    with pytest.raises(APIError, match="Stream interrupted"):
+        for token in llm_api.stream_from_api(LLMInterface._prompt(QUESTION, "context")):
+            received.append(token)
+    assert received == expected_tokens()[:3]
+
+
+def test_interrupted_answer_is_not_remembered(endpoint):
+    endpoint(disconnect_after=3)
+    cache = SemanticAnswerCache(lambda question: np.ones(4))
+    llm = LLMInterface(answer_cache=cache)
+
+    with pytest.raises(APIError):
+        list(llm.ask_stream(QUESTION, context="context", sources=SOURCES))
+    assert llm.history == []
+    assert cache.get(QUESTION, SOURCES) is None
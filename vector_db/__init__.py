@@ -1,3 +1,27 @@
-from .chroma_db import ChromaVectorDB
-from .pinecone_db import PineconeVectorDB
-from .faiss_db import FaissVectorDB
+"""Vector DB backends, imported on first use so only the selected one pays for its client library."""
+import importlib
+
+# db_type -> (module, class)
+BACKENDS = {
+    "faiss": ("faiss_db", "FaissVectorDB"),
+    "chroma": ("chroma_db", "ChromaVectorDB"),
+    "pinecone": ("pinecone_db", "PineconeVectorDB"),
+}
+__all__ = ["get_backend"] + [class_name for _, class_name in BACKENDS.values()]
+
+
+def get_backend(db_type: str):
+    """The vector DB class for a db_type ("faiss", "chroma", "pinecone"), importing only its module."""
+    try:
+        module, class_name = BACKENDS[db_type]
+    except KeyError:
+        raise ValueError(f"Unsupported vector DB type: {db_type}")
+    return getattr(importlib.import_module(f".{module}", __name__), class_name)
+
+
+def __getattr__(name):
+    # `from vector_db import FaissVectorDB` keeps working, and still imports just that backend
+    for db_type, (_, class_name) in BACKENDS.items():
+        if class_name == name:
+            return get_backend(db_type)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,31 +1,89 @@
 import os
+import numpy as np
 import chromadb
 from chromadb.config import Settings
+import metrics
 
 class ChromaVectorDB:
-    def __init__(self, collection_name="default", persist_directory="./chroma_storage"):
+    def __init__(self, collection_name="default", persist_directory="./chroma_storage", batch_size=1000):
         self.client = chromadb.PersistentClient(
             path=persist_directory,
             settings=Settings(anonymized_telemetry=False)
         )
         self.collection = self.client.get_or_create_collection(name=collection_name)
+        # Chroma rejects upserts larger than the server's max batch size
+        self.batch_size = min(batch_size, self.client.get_max_batch_size())
 
     def add_document(self, id, embedding, metadata):
         # Add a single document and its embedding
-        self.collection.upsert(
-            ids=[id],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            documents=[metadata.get("content", "")]
-        )
-        print(f"✅ ChromaVectorDB: Document {id} added.")
+        self.add_documents([id], [embedding], [metadata])
+
+    @metrics.timed("vector_db.upsert", backend="chroma")
+    def add_documents(self, ids, embeddings, metadatas, doc_id=None):
+        # Upsert in batches of self.batch_size instead of one call per chunk; Chroma takes float32 arrays as is
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if doc_id is not None:
+            # Tag every chunk with its document so delete_document can filter on it
+            metadatas = [{**m, "doc_id": str(doc_id)} for m in metadatas]
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            batch_metadatas = metadatas[start:end]
+            self.collection.upsert(
+                ids=list(ids[start:end]),
+                embeddings=embeddings[start:end],
+                metadatas=batch_metadatas,
+                documents=[m.get("content", "") for m in batch_metadatas]
+            )
+        print(f"✅ ChromaVectorDB: Added {len(ids)} documents.")
 
     def query(self, embedding, top_k=5):
-        return self.collection.query(
-            query_embeddings=[embedding],
+        return self.query_batch([embedding], top_k=top_k)[0]
+
+    @metrics.timed("vector_db.search", backend="chroma")
+    def query_batch(self, embeddings, top_k=5):
+        # Chroma answers several query embeddings in one call, one result list per query
+        result = self.collection.query(
+            query_embeddings=np.asarray(embeddings, dtype=np.float32),
             n_results=top_k,
-            include=['documents', 'metadatas']
+            include=['metadatas', 'distances']
         )
+        return [
+            [
+                {"id": id, "doc_id": (metadata or {}).get("doc_id"), "score": distance, "metadata": metadata or {}}
+                for id, metadata, distance in zip(ids, metadatas, distances)
+            ]
+            for ids, metadatas, distances in zip(result['ids'], result['metadatas'], result['distances'])
+        ]
+
+    @metrics.timed("vector_db.fetch", backend="chroma")
+    def get_chunks(self, ids):
+        # Stored metadata of the given chunk ids (missing ids are left out)
+        result = self.collection.get(ids=[str(id) for id in ids], include=['metadatas'])
+        return [
+            {"id": id, "doc_id": (metadata or {}).get("doc_id"), "metadata": metadata or {}}
+            for id, metadata in zip(result['ids'], result['metadatas'])
+        ]
+
+    @metrics.timed("vector_db.delete", backend="chroma")
+    def delete_document(self, doc_id):
+        # Remove every chunk that was added under this document id
+        self.collection.delete(where={"doc_id": str(doc_id)})
+        print(f"🗑️ ChromaVectorDB: Document {doc_id} deleted.")
+
+    @metrics.timed("vector_db.delete", backend="chroma")
+    def delete_chunks(self, ids):
+        # Remove individual chunks, e.g. the ones that disappeared from an edited file
+        for start in range(0, len(ids), self.batch_size):
+            self.collection.delete(ids=list(ids[start:start + self.batch_size]))
+
+    @metrics.timed("vector_db.update", backend="chroma")
+    def update_metadata(self, ids, metadatas, doc_id=None):
+        # Rewrite metadata of existing chunks; their embeddings stay as they are
+        if doc_id is not None:
+            metadatas = [{**m, "doc_id": str(doc_id)} for m in metadatas]
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            self.collection.update(ids=list(ids[start:end]), metadatas=metadatas[start:end])
 
     def list_documents(self):
         return self.collection.get(include=['ids'])
@@ -1,86 +1,792 @@
 import os
-import pickle
+import json
+import time
+import sqlite3
+import threading
 import numpy as np
 import faiss
+import metrics
+
+from .faiss_layout import INDEX_TYPES, PRECISIONS, pq_subquantizers, type_at, estimate_bytes
+
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def _wrap_id_map(index, labels):
+    """Rebuild an IndexIDMap2 around an already-populated positional index and its label array."""
+    # The IndexIDMap2 constructor only accepts empty indexes, so swap the populated one in afterwards
+    wrapped = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    wrapped.index = index
+    wrapped.referenced_objects = [index]
+    wrapped.ntotal = index.ntotal
+    faiss.copy_array_to_vector(np.ascontiguousarray(labels, dtype='int64'), wrapped.id_map)
+    wrapped.construct_rev_map()
+    return wrapped
+
+
+def _sq_precision(qtype):
+    for precision, sq_type in _SQ_TYPES.items():
+        if qtype == sq_type:
+            return precision
+    return f"sq{qtype}"
+
+
+def _precision_of(index):
+    """Storage precision of a positional, IVF or HNSW index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ, faiss.IndexHNSWPQ)):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return _sq_precision(index.sq.qtype)
+    return "fp32"
+
+
+def _recall_at_k(index, queries, truth, k):
+    """Mean share of the exact top-k labels that `index` also returns."""
+    _, found = index.search(queries, k)
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def _replace_file(path, write):
+    """Write to a temporary file and rename it over `path` so readers never see a half-written file."""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
 
 
 class FaissVectorDB:
-    def __init__(self, dimension, model_name):
+    def __init__(self, dimension, model_name, batch_size=4096, index_type=None, nlist=100, nprobe=8,
+                 ef_search=64, hnsw_m=32, pq_m=16, train_size=50000, read_only=False, precision=None,
+                 compact_ratio=0.1):
         self.dimension = dimension
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.pq_m = pq_m
+        self.train_size = train_size
+        self.compact_ratio = compact_ratio  # deleted vectors are dropped from the index past this share of it
+        self.read_only = read_only
+        self.autosave = True  # bulk loaders switch this off and call save() once at the end
+        if index_type is not None and index_type not in INDEX_TYPES:
+            raise ValueError(f"❌ Unsupported FAISS index type: {index_type} (choose from {', '.join(INDEX_TYPES)})")
+        if precision is not None and precision not in PRECISIONS:
+            raise ValueError(f"❌ Unsupported FAISS precision: {precision} (choose from {', '.join(PRECISIONS)})")
+        # IVF with PQ codes is the ivf_pq type
+        if index_type == "ivf_pq" and precision not in (None, "pq"):
+            raise ValueError(f"❌ FAISS ivf_pq stores PQ codes; it cannot use {precision} precision")
+        if index_type == "ivf_flat" and precision == "pq":
+            index_type = "ivf_pq"
+
         safe_model = model_name.replace("/", "_").replace("-", "_")
         self.index_path = f"faiss_{safe_model}_{dimension}.index"
-        self.ids_path = f"{self.index_path}.ids"
+        self.ids_path = f"{self.index_path}.ids"  # legacy pickled id list, removed by the migration
+        self.labels_path = f"{self.index_path}.ids.npy"  # position -> chunk id for flat/HNSW indexes
+        self.meta_path = f"{self.index_path}.meta.sqlite"
+
+        if read_only:
+            # Serving mode: nothing is opened until the first query, and then only memory-mapped.
+            # The files are reopened whenever a writer has replaced them since (see _open_read_only).
+            self.index, self.meta, self._labels, self._stamp = None, None, None, False
+            self._view = (None, None)  # (index, labels) swapped together, so a search never mixes versions
+            self._open_lock = threading.Lock()  # one handle may serve several threads (e.g. app sessions)
+            self.index_type = index_type
+            self.precision = precision
+            return
+
+        self._labels = None
+        # Chunk id -> (document id, metadata), indexed by document so deletes touch only that file's rows.
+        # Tombstones hold deleted ids whose vectors are still in the index until the next compaction.
+        self.meta = sqlite3.connect(self.meta_path, check_same_thread=False)
+        self.meta.execute("PRAGMA journal_mode=WAL")  # lets read-only processes query while we write
+        self.meta.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, doc_id TEXT, metadata TEXT)")
+        self.meta.execute("CREATE INDEX IF NOT EXISTS chunks_doc_id ON chunks (doc_id)")
+        self.meta.execute("CREATE TABLE IF NOT EXISTS tombstones (id INTEGER PRIMARY KEY)")
+        self.meta.commit()
 
         if os.path.exists(self.index_path):
             print(f"📦 Loading FAISS index from {self.index_path}")
-            self.index = faiss.read_index(self.index_path)
-            if self.index.d != self.dimension:
-                raise ValueError(f"❌ FAISS index dimension mismatch: index has {self.index.d}, expected {self.dimension}")
+            index = faiss.read_index(self.index_path)
+            if index.d != self.dimension:
+                raise ValueError(f"❌ FAISS index dimension mismatch: index has {index.d}, expected {self.dimension}")
+            if isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+                self.index = index
+            elif os.path.exists(self.labels_path):
+                self.index = _wrap_id_map(index, np.load(self.labels_path))
+            else:
+                self.index = index
+                self._migrate_legacy_index()
         else:
             print(f"🆕 Creating new FAISS index with dimension {self.dimension}")
-            self.index = faiss.IndexFlatL2(self.dimension)
+            self.index = self._new_index("flat")
 
-        # Load or initialize document ID tracking
-        if os.path.exists(self.ids_path):
-            with open(self.ids_path, "rb") as f:
-                self.ids = pickle.load(f)
+        # Without an explicit type or precision, keep whatever is on disk; otherwise re-encode the existing index
+        self.index_type, self.precision = self._target_layout(index_type, precision)
+        self._maybe_convert()
+        self._apply_search_params()
+        self._purge_orphans()
+
+    # ---------- index construction ----------
+
+    def _inner_index(self):
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    @property
+    def built_type(self):
+        """Index type of the index currently in memory."""
+        inner = self._inner_index()
+        if isinstance(inner, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(inner, faiss.IndexIVFPQ):
+            return "ivf_pq"
+        if isinstance(inner, faiss.IndexIVF):
+            return "ivf_flat"
+        return "flat"
+
+    @property
+    def built_precision(self):
+        """Storage precision of the index currently in memory."""
+        return _precision_of(self._inner_index())
+
+    @property
+    def layout(self) -> str:
+        """e.g. "hnsw/sq8"; the configured layout may differ until there is enough data to train it."""
+        return f"{self.built_type}/{self.built_precision}"
+
+    def _target_layout(self, index_type=None, precision=None):
+        """(index_type, precision) a requested layout resolves to; None keeps what is built."""
+        index_type = index_type or self.built_type
+        if index_type == "ivf_pq":
+            return index_type, "pq"
+        if precision is None:
+            # Switching away from ivf_pq means leaving PQ codes
+            precision = "fp32" if self.built_precision == "pq" and index_type == "ivf_flat" else self.built_precision
+        if index_type == "ivf_flat" and precision == "pq":
+            index_type = "ivf_pq"
+        return index_type, precision
+
+    def _min_train_size(self, index_type, precision="fp32"):
+        # k-means wants ~39 points per centroid: nlist centroids for IVF, 256 per PQ sub-quantizer codebook
+        # (fewer leaves the codes badly under-trained). SQ8 only learns per-dimension ranges, but ranges
+        # learned from very few vectors would clip the vectors added later.
+        needed = self.nlist * 39 if index_type in ("ivf_flat", "ivf_pq") else 0
+        if precision == "pq" or index_type == "ivf_pq":
+            needed = max(needed, 39 * 256)
+        elif precision == "sq8":
+            needed = max(needed, 256)
+        return needed
+
+    def _pending_layout(self):
+        """(index_type, precision) still to be reached once enough vectors exist, or None."""
+        target = (self.index_type, self.precision)
+        return None if target == (self.built_type, self.built_precision) else target
+
+    def _new_index(self, index_type, precision="fp32", sample=None):
+        d = self.dimension
+        if index_type in ("flat", "hnsw"):
+            if index_type == "flat" and precision == "fp32":
+                inner = faiss.IndexFlatL2(d)
+            elif index_type == "flat" and precision == "pq":
+                inner = faiss.IndexPQ(d, pq_subquantizers(d, self.pq_m), 8)
+            elif index_type == "flat":
+                inner = faiss.IndexScalarQuantizer(d, _SQ_TYPES[precision])
+            elif precision == "fp32":
+                inner = faiss.IndexHNSWFlat(d, self.hnsw_m)
+            elif precision == "pq":
+                inner = faiss.IndexHNSWPQ(d, pq_subquantizers(d, self.pq_m), self.hnsw_m)
+            else:
+                inner = faiss.IndexHNSWSQ(d, _SQ_TYPES[precision], self.hnsw_m)
+            if not inner.is_trained:
+                self._train(inner, f"{index_type}/{precision}", sample)
+            return faiss.IndexIDMap2(inner)
+
+        # IVF indexes carry their own ids; a hashtable direct map gives O(k) remove_ids and reconstruct
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, d, self.nlist, pq_subquantizers(d, self.pq_m), 8)
+        elif precision == "fp32":
+            index = faiss.IndexIVFFlat(quantizer, d, self.nlist)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, d, self.nlist, _SQ_TYPES[precision])
+        self._train(index, f"{index_type}/{precision} (nlist={self.nlist})", sample)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index
+
+    def _train(self, index, description, sample):
+        if len(sample) > self.train_size:
+            rng = np.random.default_rng(0)
+            sample = sample[rng.choice(len(sample), self.train_size, replace=False)]
+        print(f"🏋️ FAISS: Training {description} index on {len(sample)} vectors")
+        index.train(np.ascontiguousarray(sample, dtype='float32'))
+
+    def _maybe_convert(self):
+        """Re-encode the stored vectors into the configured type and precision once there is enough data to train them."""
+        if self._pending_layout() is None:
+            return
+        needed = self._min_train_size(self.index_type, self.precision)
+        if self.index.ntotal < needed:
+            # Too few vectors to train yet; conversion completes after a later add. HNSW needs no training
+            # of its own, so only its precision waits; IVF falls back to an exact flat scan (fast at this
+            # size). Keep the stored precision if it already matches or needs no training, else use fp32.
+            index_type = "hnsw" if self.index_type == "hnsw" else "flat"
+            precision = self.precision
+            if self._min_train_size("flat", precision) and self.built_precision != precision:
+                precision = "fp32"
+            if (self.built_type, self.built_precision) != (index_type, precision):
+                if self.index.ntotal:
+                    print(f"ℹ️ FAISS: {self.index.ntotal} vectors are too few to train {self.index_type}/{self.precision} "
+                          f"(needs {needed}); using {index_type}/{precision} until then")
+                self.rebuild(index_type, precision)
+            return
+        self.rebuild(self.index_type, self.precision)
+
+    def rebuild(self, index_type, precision=None):
+        """Re-create the index as `index_type` / `precision` from the vectors currently stored (also drops tombstones).
+
+        Precision defaults to the current one. Re-encoding to a lossier precision reports the measured
+        recall@10 of the new index against exact search over the vectors it was built from.
+        """
+        precision = "pq" if index_type == "ivf_pq" else (precision or self.built_precision)
+        if index_type == "ivf_flat" and precision == "pq":
+            index_type = "ivf_pq"
+        labels = np.array([row[0] for row in self.meta.execute("SELECT id FROM chunks ORDER BY id")], dtype='int64')
+        vectors = self.index.reconstruct_batch(labels) if len(labels) else np.empty((0, self.dimension), dtype='float32')
+        old_layout, new_layout = self.layout, f"{index_type}/{precision}"
+        if new_layout == old_layout:
+            print(f"🧹 FAISS: Compacting {index_type} index ({len(labels)} live vectors)")
         else:
-            self.ids = []
+            print(f"🔁 FAISS: Converting {old_layout} index with {len(labels)} vectors to {new_layout}")
+            if self.built_precision in PRECISIONS and PRECISIONS.index(precision) < PRECISIONS.index(self.built_precision):
+                print(f"⚠️ FAISS: The stored vectors are {self.built_precision}; re-ingest files to regain full precision.")
+        new_index = self._new_index(index_type, precision, sample=vectors)
+        for start in range(0, len(labels), self.batch_size):
+            end = start + self.batch_size
+            new_index.add_with_ids(vectors[start:end], labels[start:end])
+        if precision != self.built_precision and precision != "fp32" and len(labels):
+            rng = np.random.default_rng(0)
+            queries = vectors[rng.choice(len(vectors), min(200, len(vectors)), replace=False)]
+            k = min(10, len(labels))
+            exact = faiss.IndexFlatL2(self.dimension)
+            exact.add(vectors)
+            truth = labels[exact.search(queries, k)[1]]
+            self._apply_search_params(new_index)
+            print(f"📏 FAISS: recall@{k} after re-encoding {self.built_precision} -> {precision}: "
+                  f"{_recall_at_k(new_index, queries, truth, k):.3f}")
+        self.index = new_index
+        with self.meta:
+            self.meta.execute("DELETE FROM tombstones")
+        self._apply_search_params()
+        self._persist()
+
+    def _apply_search_params(self, index=None):
+        index = self.index if index is None else index
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = min(self.nprobe, index.nlist)
+            return
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+
+    def _read_index_mmap(self):
+        # Flat/HNSW codes map with IO_FLAG_MMAP_IFC (newer FAISS), IVF lists with IO_FLAG_MMAP;
+        # FAISS rejects the combination for IVF, so fall back flag by flag
+        candidates = [faiss.IO_FLAG_MMAP]
+        if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            candidates.insert(0, faiss.IO_FLAG_MMAP_IFC)
+        for flag in candidates:
+            try:
+                return faiss.read_index(self.index_path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                if flag == candidates[-1]:
+                    raise
+
+    def _file_stamp(self):
+        """Identity of the index and id files on disk; writers replace them by rename, so any save changes it."""
+        stamp = []
+        for path in (self.index_path, self.labels_path):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _open_read_only(self):
+        """Memory-map the index, its id array and the metadata DB on first use, and again once a writer saved.
 
-        self.id_map = {}  # optional metadata store (you can persist this too if needed)
+        Deletes only touch the metadata DB, which a read-only connection sees as soon as they commit;
+        added vectors arrive with a new index file, which is mapped in place of the old one.
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        with self._open_lock:
+            if self._stamp is False and self._is_legacy():
+                self._migrate_for_reading()
+                stamp = self._file_stamp()
+            if stamp != self._stamp:
+                self._open_files(first=self._stamp is False)
+                self._stamp = stamp
+
+    def _is_legacy(self):
+        """An index written before the ID-mapped format: a pickled id list and no metadata DB."""
+        return os.path.exists(self.index_path) and (
+            os.path.exists(self.ids_path) or not os.path.exists(self.meta_path)
+        )
+
+    def _migrate_for_reading(self):
+        """Open the index writable once, which migrates it, so it can then be memory-mapped."""
+        print(f"🔁 FAISS: {self.index_path} predates the read-only format; migrating it once")
+        writer = FaissVectorDB(self.dimension, self.model_name, batch_size=self.batch_size, nlist=self.nlist,
+                               nprobe=self.nprobe, ef_search=self.ef_search, hnsw_m=self.hnsw_m, pq_m=self.pq_m,
+                               train_size=self.train_size, compact_ratio=self.compact_ratio)
+        writer.meta.close()
+
+    def _open_files(self, first=True):
+        if not os.path.exists(self.index_path):
+            if first:
+                print(f"⚠️ FAISS: No index at {self.index_path} yet; queries return no results until one is written.")
+            return
+
+        for attempt in range(2):
+            index = self._read_index_mmap()
+            if isinstance(index, faiss.IndexIVF):
+                labels = None
+                break
+            if not os.path.exists(self.labels_path):
+                # Positions are not chunk ids; serving them would attach hits to the wrong chunks
+                raise RuntimeError(f"❌ FAISS: {self.labels_path} is missing, so the vectors in {self.index_path} "
+                                   f"cannot be mapped to chunk ids; re-ingest the files to rebuild the index")
+            labels = np.load(self.labels_path, mmap_mode='r')
+            if len(labels) == index.ntotal:
+                break
+            # A writer replaced one of the two files between our reads; the retry sees a matching pair
+            time.sleep(0.05)
+        else:
+            raise RuntimeError(f"❌ FAISS: {self.labels_path} does not match {self.index_path}")
+        if index.d != self.dimension:
+            raise ValueError(f"❌ FAISS index dimension mismatch: index has {index.d}, expected {self.dimension}")
+        self._apply_search_params(index)
+        self._view = (index, labels)
+        self.index, self._labels = index, labels
+        if first:
+            wanted = f"{self.index_type or self.built_type}/{self.precision or self.built_precision}"
+            if wanted != self.layout:
+                print(f"⚠️ FAISS: Serving the stored {self.layout} index; open it writable to convert to {wanted}.")
+        else:
+            print(f"🔄 FAISS: Reopened {self.index_path} ({index.ntotal} vectors)")
+        if self.meta is None:
+            self.meta = sqlite3.connect(f"file:{self.meta_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _migrate_legacy_index(self):
+        """Replace a positional IndexFlatL2 (+ pickled id list) with an empty ID-mapped index.
+
+        The old format never stored which file a vector came from, so its vectors cannot be deleted or
+        re-ingested over; they are dropped rather than served as hits without a source or text.
+        """
+        print(f"🔁 Migrating {self.index_path} to an ID-mapped index")
+        dropped = self.index.ntotal
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        if dropped:
+            print(f"⚠️ FAISS: Dropped {dropped} legacy vectors with no source file; re-ingest their files to restore them.")
+        self._persist()
+        if os.path.exists(self.ids_path):
+            os.remove(self.ids_path)
+
+    def _purge_orphans(self):
+        """Drop chunks without a document, left by the earlier migration that kept legacy vectors."""
+        labels = np.array([row[0] for row in self.meta.execute("SELECT id FROM chunks WHERE doc_id IS NULL")],
+                          dtype='int64')
+        if not len(labels):
+            return
+        print(f"🧹 FAISS: Removing {len(labels)} migrated vectors that no file owns")
+        with self.meta:
+            self.meta.execute("DELETE FROM chunks WHERE doc_id IS NULL")
+            self.meta.executemany("INSERT OR IGNORE INTO tombstones (id) VALUES (?)", [(int(l),) for l in labels])
+        self.compact()
+
+    # ---------- reads and writes ----------
+
+    @property
+    def next_id(self):
+        """First chunk id above every id currently stored (tombstoned ids included)."""
+        row = self.meta.execute(
+            "SELECT MAX(m) FROM (SELECT MAX(id) AS m FROM chunks UNION ALL SELECT MAX(id) FROM tombstones)"
+        ).fetchone()
+        return (row[0] or 0) + 1
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("❌ FAISS: index was opened read-only")
+
+    def _persist(self):
+        if self.autosave:
+            self.save()
 
     def save(self):
-        faiss.write_index(self.index, self.index_path)
-        with open(self.ids_path, "wb") as f:
-            pickle.dump(self.ids, f)
+        self._check_writable()
+        if isinstance(self.index, faiss.IndexIDMap2):
+            # Store the positional index and its ids as a flat int64 array that readers can mmap
+            labels = faiss.vector_to_array(self.index.id_map)
+
+            def write_labels(path):
+                with open(path, "wb") as f:
+                    np.save(f, labels)
+
+            _replace_file(self.labels_path, write_labels)
+            _replace_file(self.index_path, lambda path: faiss.write_index(self.index.index, path))
+        else:
+            _replace_file(self.index_path, lambda path: faiss.write_index(self.index, path))
+            if os.path.exists(self.labels_path):
+                os.remove(self.labels_path)
 
     def add_document(self, doc_id, embedding, metadata=None):
-        vector = [embedding]
+        self.add_documents([doc_id], [embedding], [metadata])
+
+    @metrics.timed("vector_db.upsert", backend="faiss")
+    def add_documents(self, ids, embeddings, metadatas=None, doc_id=None):
+        """Add a batch of vectors under integer chunk ids, grouped under `doc_id`, with a single index write."""
+        self._check_writable()
+        matrix = np.asarray(embeddings, dtype='float32')
+        if matrix.ndim != 2 or matrix.shape[1] != self.index.d:
+            raise ValueError(f"❌ Embedding dimension mismatch: got {matrix.shape[-1]}, expected {self.index.d}")
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"❌ Got {len(ids)} ids for {matrix.shape[0]} embeddings")
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        labels = np.asarray(ids, dtype='int64')
+
+        # Re-adding an existing (or deleted, not yet compacted) id replaces its vector instead of duplicating the label
+        existing = self._existing_ids(labels) + self._tombstoned_ids(labels)
+        if existing and self.built_type == "hnsw":
+            raise ValueError(f"❌ FAISS: HNSW index cannot overwrite existing ids {existing[:5]}")
+        if existing:
+            self._drop_vectors(np.array(existing, dtype='int64'))
+            with self.meta:
+                self.meta.executemany("DELETE FROM tombstones WHERE id = ?", [(int(l),) for l in existing])
+
+        for start in range(0, matrix.shape[0], self.batch_size):
+            end = start + self.batch_size
+            self.index.add_with_ids(matrix[start:end], labels[start:end])
+        with self.meta:
+            self.meta.executemany(
+                "INSERT OR REPLACE INTO chunks (id, doc_id, metadata) VALUES (?, ?, ?)",
+                [
+                    (int(label), None if doc_id is None else str(doc_id), json.dumps(metadata or {}))
+                    for label, metadata in zip(labels, metadatas)
+                ]
+            )
+        if self._pending_layout() and self.index.ntotal >= self._min_train_size(self.index_type, self.precision):
+            self.rebuild(self.index_type, self.precision)
+        else:
+            self._persist()
+        print(f"✅ FAISS: Added {len(ids)} vectors.")
+
+    def _existing_ids(self, labels, table="chunks"):
+        found = []
+        for start in range(0, len(labels), 500):
+            batch = [int(label) for label in labels[start:start + 500]]
+            placeholders = ",".join("?" * len(batch))
+            found.extend(row[0] for row in self.meta.execute(
+                f"SELECT id FROM {table} WHERE id IN ({placeholders})", batch
+            ))
+        return found
+
+    def _tombstoned_ids(self, labels):
+        return self._existing_ids(labels, table="tombstones")
+
+    def _drop_vectors(self, labels):
+        """Physically remove vectors from a flat or IVF index (a scan of the flat storage)."""
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.remove_ids(faiss.IDSelectorArray(len(labels), faiss.swig_ptr(labels)))
+        else:
+            self.index.remove_ids(labels)
+
+    def _remove_labels(self, labels):
+        # Deleting only records tombstones (O(chunks deleted), no index write); the vectors stay in the
+        # index, hidden from results because their metadata rows are gone, until compact() drops them
+        with self.meta:
+            self.meta.executemany("INSERT OR IGNORE INTO tombstones (id) VALUES (?)", [(int(l),) for l in labels])
+        if self._tombstone_count() > self.compact_ratio * max(self.index.ntotal, 1):
+            self.compact()
+
+    def _tombstone_count(self):
+        return self.meta.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
 
-        if len(vector[0]) != self.index.d:
-            raise ValueError(f"❌ Embedding dimension mismatch: got {len(vector[0])}, expected {self.index.d}")
+    def compact(self):
+        """Drop tombstoned vectors from the index: in place for flat/IVF, by rebuilding the graph for HNSW."""
+        self._check_writable()
+        if self.built_type == "hnsw":
+            self.rebuild("hnsw")
+            return
+        labels = np.array([row[0] for row in self.meta.execute("SELECT id FROM tombstones")], dtype='int64')
+        if not len(labels):
+            return
+        print(f"🧹 FAISS: Compacting {self.layout} index ({len(labels)} deleted vectors)")
+        self._drop_vectors(labels)
+        with self.meta:
+            self.meta.execute("DELETE FROM tombstones")
+        self._persist()
 
-        self.index.add(np.array(vector).astype('float32'))
-        self.ids.append(doc_id)
-        self.id_map[doc_id] = metadata
-        self.save()
-        print(f"✅ FAISS: Document {doc_id} added.")
+    def _search(self, matrix, k):
+        # A read-only handle may be swapped for a newer file by another thread; search one consistent pair
+        index, labels = self._view if self.read_only else (self.index, None)
+        D, I = index.search(matrix, k)
+        if labels is not None and len(labels):  # an empty index returns only -1
+            # Read-only flat/HNSW indexes return positions; translate them through the mmapped id array
+            I = np.where(I >= 0, labels[np.maximum(I, 0)], -1)
+        return D, I
 
     def query(self, query_embedding, top_k=5):
-        vector = [query_embedding]
+        return self.query_batch([query_embedding], top_k=top_k)[0]
+
+    @metrics.timed("vector_db.search", backend="faiss")
+    def query_batch(self, query_embeddings, top_k=5):
+        """Search many query vectors with one matrix search; returns one result list per query."""
+        matrix = np.asarray(query_embeddings, dtype='float32').reshape(len(query_embeddings), -1)
+        if matrix.shape[1] != self.dimension:
+            raise ValueError(f"❌ Query dimension mismatch: got {matrix.shape[1]}, expected {self.dimension}")
+        if self.read_only:
+            self._open_read_only()
+            if self.index is None:
+                return [[] for _ in range(len(matrix))]
 
-        if len(vector[0]) != self.index.d:
-            raise ValueError(f"❌ Query dimension mismatch: got {len(vector[0])}, expected {self.index.d}")
+        # Deleted (tombstoned) vectors still come back from the index and are dropped below. Over-fetch a
+        # little, and search again with a larger k only for queries left with fewer than top_k live hits.
+        max_fetch = top_k + self._tombstone_count()
+        fetch = min(max_fetch, 2 * top_k + 16)
+        rows = {}  # label -> (doc_id, metadata), or None for a deleted label
+        batch_results = [None] * len(matrix)
+        pending = list(range(len(matrix)))
+        while pending:
+            D, I = self._search(matrix[pending], fetch)
+            hits = [
+                [(int(label), float(score)) for label, score in zip(labels, scores) if label != -1]
+                for labels, scores in zip(I, D)
+            ]
+            self._load_rows(rows, {label for query_hits in hits for label, _ in query_hits} - rows.keys())
+            retry = []
+            for q, query_hits in zip(pending, hits):
+                live = [(label, score) for label, score in query_hits if rows[label] is not None]
+                if len(live) < top_k and len(query_hits) == fetch and fetch < max_fetch:
+                    retry.append(q)
+                    continue
+                # Each query gets its own dict copies; hits shared between queries must not alias
+                batch_results[q] = [
+                    {"id": label, "doc_id": rows[label][0], "score": score, "metadata": dict(rows[label][1])}
+                    for label, score in live[:top_k]
+                ]
+            pending, fetch = retry, min(max_fetch, fetch * 4)
+        return batch_results
 
-        D, I = self.index.search(np.array(vector).astype('float32'), top_k)
-        results = []
-        for i, score in zip(I[0], D[0]):
-            if 0 <= i < len(self.ids):
-                doc_id = self.ids[i]
-                results.append({"id": doc_id, "score": float(score)})
-        return results
+    def _load_rows(self, rows, labels):
+        """One metadata lookup for a batch of hits; labels without a chunk row map to None."""
+        labels = list(labels)
+        for label in labels:
+            rows[label] = None
+        for start in range(0, len(labels), 900):  # stay under SQLite's bound-parameter limit
+            part = labels[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            for label, doc_id, metadata in self.meta.execute(
+                f"SELECT id, doc_id, metadata FROM chunks WHERE id IN ({placeholders}) AND doc_id IS NOT NULL", part
+            ):
+                rows[label] = (doc_id, json.loads(metadata))
 
+    @metrics.timed("vector_db.fetch", backend="faiss")
+    def get_chunks(self, ids):
+        """Stored doc id and metadata of the given chunk ids (missing ids are left out)."""
+        if self.read_only:
+            self._open_read_only()
+            if self.meta is None:
+                return []
+        found = []
+        ids = [int(id) for id in ids]
+        for start in range(0, len(ids), 900):
+            part = ids[start:start + 900]
+            placeholders = ",".join("?" * len(part))
+            for label, doc_id, metadata in self.meta.execute(
+                f"SELECT id, doc_id, metadata FROM chunks WHERE id IN ({placeholders}) AND doc_id IS NOT NULL", part
+            ):
+                found.append({"id": label, "doc_id": doc_id, "metadata": json.loads(metadata)})
+        return found
+
+    @metrics.timed("vector_db.delete", backend="faiss")
     def delete_document(self, doc_id):
-        if doc_id not in self.ids:
+        """Remove every chunk added under `doc_id`; cost depends on that file's chunk count only.
+
+        Nothing in the index is rewritten: the chunks become tombstones, and the O(index) compaction
+        runs once they pass `compact_ratio` of the index, so its cost is spread over many deletes.
+        """
+        self._check_writable()
+        rows = self.meta.execute("SELECT id FROM chunks WHERE doc_id = ?", (str(doc_id),)).fetchall()
+        if not rows:
             print(f"⚠️ FAISS: Document ID {doc_id} not found.")
             return
 
-        index = self.ids.index(doc_id)
-        print(f"🗑️ FAISS: Removing document ID {doc_id} at index {index}")
-        del self.ids[index]
-        del self.id_map[doc_id]
+        labels = np.array([row[0] for row in rows], dtype='int64')
+        print(f"🗑️ FAISS: Removing document ID {doc_id} ({len(labels)} chunks)")
+        with self.meta:
+            self.meta.execute("DELETE FROM chunks WHERE doc_id = ?", (str(doc_id),))
+        self._remove_labels(labels)
 
-        # Rebuild index from remaining vectors
-        new_index = faiss.IndexFlatL2(self.dimension)
-        new_vectors = []
+    @metrics.timed("vector_db.delete", backend="faiss")
+    def delete_chunks(self, ids):
+        """Remove individual chunks by id (used when only part of a file changed)."""
+        self._check_writable()
+        labels = np.array(self._existing_ids(np.asarray(ids, dtype='int64')), dtype='int64')
+        if not len(labels):
+            return
+        with self.meta:
+            self.meta.executemany("DELETE FROM chunks WHERE id = ?", [(int(l),) for l in labels])
+        self._remove_labels(labels)
 
-        for i in self.ids:
-            meta = self.id_map.get(i)
-            if meta and "embedding" in meta:
-                new_vectors.append(meta["embedding"])
+    @metrics.timed("vector_db.update", backend="faiss")
+    def update_metadata(self, ids, metadatas, doc_id=None):
+        """Replace the stored metadata of existing chunks without touching their vectors."""
+        self._check_writable()
+        with self.meta:
+            self.meta.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ?",
+                [(json.dumps(metadata or {}), int(id)) for id, metadata in zip(ids, metadatas)]
+            )
 
-        if new_vectors:
-            new_index.add(np.array(new_vectors).astype('float32'))
+    # ---------- memory ----------
 
-        self.index = new_index
-        self.save()
+    def _estimate_bytes(self, n, index_type, precision):
+        return estimate_bytes(n, self.dimension, index_type, precision, self.nlist, self.hnsw_m, self.pq_m)
+
+    def _type_at(self, precision):
+        """The current index type re-encoded at `precision` (IVF switches between ivf_flat and ivf_pq)."""
+        return type_at(self.built_type, precision)
+
+    def memory_estimate(self):
+        """Approximate RAM of the stored vectors in the current layout and at each precision, or None without an index."""
+        if self.read_only:
+            self._open_read_only()
+            if self.index is None:
+                return None
+        n = self.index.ntotal
+        by_precision = {precision: self._estimate_bytes(n, self._type_at(precision), precision)
+                        for precision in PRECISIONS}
+        return {
+            "layout": self.layout,
+            "vectors": n,
+            "dimension": self.dimension,
+            "bytes": by_precision.get(self.built_precision, by_precision["fp32"]),
+            "by_precision": by_precision,
+        }
+
+    # ---------- evaluation ----------
+
+    def recall_report(self, num_queries=200, top_k=10, index_type=None, precision=None):
+        """Measure recall@k and latency of an index against an exact flat scan of the same vectors.
+
+        Without `index_type`/`precision` the stored index is measured. Otherwise a candidate index of that
+        layout is built in memory from the stored vectors and measured; nothing is written, so a setting
+        can be tried before the index is converted to it. Stored vectors are sampled as queries. For
+        IVF/HNSW the search knob (nprobe / efSearch) is swept so the speed/recall trade-off is visible.
+        """
+        self._check_writable()
+        labels = np.array([row[0] for row in self.meta.execute("SELECT id FROM chunks ORDER BY id")], dtype='int64')
+        index_type, precision = self._target_layout(index_type, precision)
+        candidate = (index_type, precision) != (self.built_type, self.built_precision)
+        if not len(labels):
+            return {"index_type": index_type, "precision": precision, "candidate": candidate, "vectors": 0, "rows": []}
+        vectors = self.index.reconstruct_batch(labels)
+        index = self.index
+        if candidate:
+            needed = self._min_train_size(index_type, precision)
+            if len(labels) < needed:
+                raise ValueError(f"❌ FAISS: {index_type}/{precision} needs at least {needed} vectors to train, "
+                                 f"{len(labels)} are stored")
+            index = self._new_index(index_type, precision, sample=vectors)
+            for start in range(0, len(labels), self.batch_size):
+                index.add_with_ids(vectors[start:start + self.batch_size], labels[start:start + self.batch_size])
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+        k = min(top_k, len(labels))
+
+        exact = faiss.IndexFlatL2(self.dimension)
+        exact.add(vectors)
+        start = time.perf_counter()
+        _, truth_pos = exact.search(queries, k)
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        truth = labels[truth_pos]
+
+        def measure():
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            return float(recall), latency_ms
+
+        rows = []
+        if isinstance(index, faiss.IndexIVF):
+            for nprobe in [p for p in (1, 2, 4, 8, 16, 32, 64, 128) if p <= index.nlist]:
+                index.nprobe = nprobe
+                recall, latency_ms = measure()
+                rows.append({"param": "nprobe", "value": nprobe, "recall": recall, "latency_ms": latency_ms})
+        elif index_type == "hnsw":
+            hnsw = faiss.downcast_index(index.index).hnsw
+            for ef in (16, 32, 64, 128, 256):
+                hnsw.efSearch = max(ef, k)
+                recall, latency_ms = measure()
+                rows.append({"param": "efSearch", "value": ef, "recall": recall, "latency_ms": latency_ms})
+        self._apply_search_params(index)
+        recall, latency_ms = measure()
+        rows.append({"param": "configured", "value": None, "recall": recall, "latency_ms": latency_ms})
+
+        return {
+            "index_type": index_type,
+            "precision": precision,
+            "candidate": candidate,
+            "vectors": len(labels),
+            "queries": len(queries),
+            "top_k": k,
+            "exact_latency_ms": exact_ms,
+            "rows": rows
+        }
+
+    def precision_report(self, num_queries=200, top_k=10):
+        """Recall@k and latency of flat scans over the stored vectors encoded at each precision.
+
+        Isolates what quantization alone costs, against an exact fp32 scan of the same vectors (which
+        are themselves decoded from the stored precision). Precisions that need more training data
+        than is stored are skipped.
+        """
+        self._check_writable()
+        labels = np.array([row[0] for row in self.meta.execute("SELECT id FROM chunks ORDER BY id")], dtype='int64')
+        if not len(labels):
+            return {"precision": self.built_precision, "vectors": 0, "rows": []}
+        vectors = self.index.reconstruct_batch(labels)
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)]
+        k = min(top_k, len(labels))
+        positions = np.arange(len(labels), dtype='int64')
+
+        rows, truth = [], None
+        for precision in PRECISIONS:
+            if len(labels) < self._min_train_size("flat", precision):
+                continue
+            index = self._new_index("flat", precision, sample=vectors)
+            index.add_with_ids(vectors, positions)
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            if truth is None:
+                truth = found  # fp32 comes first: exact search
+            recall = float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+            rows.append({
+                "precision": precision,
+                "recall": recall,
+                "recall_delta": recall - 1.0,
+                "latency_ms": latency_ms,
+                "bytes": self._estimate_bytes(len(labels), self._type_at(precision), precision),
+            })
+        return {"precision": self.built_precision, "vectors": len(labels), "queries": len(queries), "top_k": k,
+                "rows": rows}
@@ -0,0 +1,49 @@
+"""FAISS index layouts and their memory footprint, without importing faiss (so `list` stays fast)."""
+
+# flat: exact brute-force scan; ivf_*: inverted lists probed with `nprobe`; hnsw: graph searched with `efSearch`
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# How each vector is stored: float32, float16, 8-bit scalar quantization (per-dimension ranges),
+# or product quantization (pq_m bytes per vector). Vectors are unit length, so all but PQ lose little.
+PRECISIONS = ("fp32", "fp16", "sq8", "pq")
+
+
+def pq_subquantizers(dimension, requested):
+    """Largest sub-quantizer count <= requested that divides the dimension (PQ requirement)."""
+    for m in range(min(requested, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def type_at(index_type, precision):
+    """`index_type` re-encoded at `precision` (IVF switches between ivf_flat and ivf_pq)."""
+    if index_type.startswith("ivf"):
+        return "ivf_pq" if precision == "pq" else "ivf_flat"
+    return index_type
+
+
+def estimate_bytes(n, dimension, index_type, precision, nlist=100, hnsw_m=32, pq_m=16):
+    """Approximate RAM of `n` vectors stored as `index_type` at `precision`."""
+    d = dimension
+    code = {"fp32": 4 * d, "fp16": 2 * d, "sq8": d, "pq": pq_subquantizers(d, pq_m)}[precision]
+    fixed = {"fp32": 0, "fp16": 0, "sq8": 2 * 4 * d, "pq": 256 * 4 * d}[precision]  # SQ ranges / PQ codebooks
+    # 8-byte id plus ~32 bytes of hash-map entry per vector (IndexIDMap2 reverse map, IVF direct map)
+    per_vector = code + 40
+    if index_type == "hnsw":
+        per_vector += 2 * hnsw_m * 4 * 1.1  # level-0 links, plus ~1/M more on the upper levels
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        fixed += nlist * 4 * d  # coarse centroids
+    return int(n * per_vector + fixed)
+
+
+def memory_estimate(n, dimension, index_type, precision, nlist=100, hnsw_m=32, pq_m=16):
+    """{"layout", "vectors", "dimension", "bytes", "by_precision"} for `n` vectors in the given layout."""
+    by_precision = {p: estimate_bytes(n, dimension, type_at(index_type, p), p, nlist, hnsw_m, pq_m)
+                    for p in PRECISIONS}
+    return {
+        "layout": f"{index_type}/{precision}",
+        "vectors": n,
+        "dimension": dimension,
+        "bytes": by_precision.get(precision, by_precision["fp32"]),
+        "by_precision": by_precision,
+    }
@@ -1,23 +1,30 @@
-from dotenv import load_dotenv
-load_dotenv()
-
 import os
-print("DEBUG ENV:", os.getenv("PINECONE_API_KEY"), os.getenv("PINECONE_ENV"))
-
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from pinecone import Pinecone, ServerlessSpec
+import metrics
 
 
 class PineconeVectorDB:
-    """Vector database handler for Pinecone v3."""
-    def __init__(self, index_name: str, dimension: int):
+    """Vector database handler for Pinecone v3.
+
+    `client` replaces the Pinecone client (anything with the same list/create/describe_index and Index
+    methods), e.g. the in-memory stand-in in bench/local_pinecone.py; no API key is needed then.
+    """
+    def __init__(self, index_name: str, dimension: int, batch_size: int = 100, query_concurrency: int = 8,
+                 client=None):
+        from dotenv import load_dotenv
+        load_dotenv()  # credentials may live in .env; read when a Pinecone store is opened, not at import
         api_key = os.getenv("PINECONE_API_KEY")
         env = os.getenv("PINECONE_ENV")  # should be the region (e.g., "us-west-4")
-        if not api_key or not env:
+        if client is None and (not api_key or not env):
             raise RuntimeError("Pinecone API key and environment must be set (PINECONE_API_KEY, PINECONE_ENV).")
 
         self.dimension = dimension
         self.index_name = index_name
-        self.pc = Pinecone(api_key=api_key)
+        self.batch_size = batch_size  # Pinecone recommends upserts of at most ~100 vectors
+        self.query_concurrency = query_concurrency  # parallel requests in query_batch
+        self.pc = client or Pinecone(api_key=api_key)
 
         # Create index if it doesn't exist
         index_names = [i.name for i in self.pc.list_indexes()]
@@ -27,7 +34,7 @@ class PineconeVectorDB:
                 name=self.index_name,
                 dimension=self.dimension,
                 metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region=env)
+                spec=ServerlessSpec(cloud="aws", region=env or "us-east-1")
             )
         else:
             # Optional: verify dimension
@@ -40,26 +47,89 @@ class PineconeVectorDB:
 
     def add_document(self, doc_id: str, embedding: list, metadata: dict = None):
         """Add or update a document vector in the Pinecone index."""
-        if hasattr(embedding, 'tolist'):
-            embedding = embedding.tolist()
-        vector = {
-            "id": str(doc_id),
-            "values": embedding,
-            "metadata": metadata or {}
-        }
-        self.index.upsert(vectors=[vector])
-        print(f"📤 Pinecone: Upserted document ID {doc_id}")
+        self.add_documents([doc_id], [embedding], [metadata])
+
+    @metrics.timed("vector_db.upsert", backend="pinecone")
+    def add_documents(self, ids: list, embeddings, metadatas: list = None, doc_id: str = None):
+        """Add or update many chunk vectors, upserting in batches of `batch_size`.
+
+        Chunk ids are expected to be prefixed with `doc_id` (e.g. `<doc_id>_chunk0`) so
+        delete_document can find them again.
+        """
+        # The client serializes plain lists: convert the whole matrix once
+        embeddings = np.asarray(embeddings, dtype=np.float32).tolist()
+        if metadatas is None:
+            metadatas = [None] * len(ids)
+        vectors = [
+            {
+                "id": str(id),
+                "values": embedding,
+                "metadata": metadata or {}
+            }
+            for id, embedding, metadata in zip(ids, embeddings, metadatas)
+        ]
+        for start in range(0, len(vectors), self.batch_size):
+            self.index.upsert(vectors=vectors[start:start + self.batch_size])
+        print(f"📤 Pinecone: Upserted {len(vectors)} vectors")
 
+    @metrics.timed("vector_db.delete", backend="pinecone")
     def delete_document(self, doc_id: str):
-        """Delete a document by ID from Pinecone."""
-        self.index.delete(ids=[str(doc_id)])
+        """Delete all chunks of a document from Pinecone, found by their `<doc_id>_chunk` id prefix."""
+        for page in self.index.list(prefix=f"{doc_id}_chunk"):
+            # v3 yields lists of id strings; newer clients yield responses with `.vectors`
+            items = page if isinstance(page, list) else getattr(page, "vectors", [])
+            ids = [item if isinstance(item, str) else item.id for item in items]
+            if ids:
+                self.index.delete(ids=ids)
         return True
 
+    @metrics.timed("vector_db.delete", backend="pinecone")
+    def delete_chunks(self, ids: list):
+        """Delete individual chunk vectors by id."""
+        ids = [str(id) for id in ids]
+        for start in range(0, len(ids), 1000):  # Pinecone deletes at most 1000 ids per call
+            self.index.delete(ids=ids[start:start + 1000])
+
+    @metrics.timed("vector_db.update", backend="pinecone")
+    def update_metadata(self, ids: list, metadatas: list, doc_id: str = None):
+        """Replace metadata of existing chunk vectors (Pinecone updates one id per call)."""
+        for id, metadata in zip(ids, metadatas):
+            self.index.update(id=str(id), set_metadata=metadata or {})
+
     def query(self, vector: list, top_k: int = 5):
         """Query Pinecone for top-k similar vectors."""
         result = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
         matches = result.get("matches", []) if isinstance(result, dict) else getattr(result, "matches", [])
-        return [{"id": m["id"], "score": m["score"]} if isinstance(m, dict) else {"id": m.id, "score": m.score} for m in matches]
+        results = []
+        for m in matches:
+            if isinstance(m, dict):
+                id, score, metadata = m["id"], m["score"], m.get("metadata") or {}
+            else:
+                id, score, metadata = m.id, m.score, m.metadata or {}
+            results.append({"id": id, "doc_id": id.rsplit("_chunk", 1)[0], "score": score, "metadata": dict(metadata)})
+        return results
+
+    @metrics.timed("vector_db.search", backend="pinecone")
+    def query_batch(self, vectors, top_k: int = 5):
+        """Query many vectors; Pinecone has no multi-vector query, so the requests are sent concurrently."""
+        vectors = np.asarray(vectors, dtype=np.float32).tolist()
+        if len(vectors) <= 1:
+            return [self.query(vector, top_k=top_k) for vector in vectors]
+        with ThreadPoolExecutor(max_workers=min(self.query_concurrency, len(vectors))) as pool:
+            return list(pool.map(lambda vector: self.query(vector, top_k=top_k), vectors))
+
+    @metrics.timed("vector_db.fetch", backend="pinecone")
+    def get_chunks(self, ids: list):
+        """Stored metadata of the given chunk ids (missing ids are left out)."""
+        chunks = []
+        ids = [str(id) for id in ids]
+        for start in range(0, len(ids), 1000):  # Pinecone fetches at most 1000 ids per call
+            result = self.index.fetch(ids=ids[start:start + 1000])
+            vectors = result.get("vectors", {}) if isinstance(result, dict) else getattr(result, "vectors", {})
+            for id, vector in vectors.items():
+                metadata = vector.get("metadata") if isinstance(vector, dict) else getattr(vector, "metadata", None)
+                chunks.append({"id": id, "doc_id": id.rsplit("_chunk", 1)[0], "metadata": dict(metadata or {})})
+        return chunks
 
     def list_documents(self):
         """List all IDs in the Pinecone index — not supported, return empty list."""